@@ -0,0 +1,189 @@
+import argparse
+import glob
+import hashlib
+import importlib.util
+import os
+import sys
+import uuid
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from normalize import canonical, clean_parts
+from writer import save_atomic
+
+AUDIT_DIR = 'rt_reconciler_audit'
+COLUMNS = ['run_id', 'run_at', 'rt_file', 'rt_part', 'rt_qty', 'status', 'match_via', 'row_key', 'iet', 'part_number', 'return_qty']
+# Row columns left out of row_key: match helpers, not workbook content
+KEY_SKIP = ['_clean_iet', '_clean_pn', '_matched', '_match_status']
+
+
+def default_audit_dir(simple_file):
+    return os.path.join(os.path.dirname(simple_file), AUDIT_DIR)
+
+
+def new_run_id():
+    return '{}_{}'.format(datetime.now().strftime('%Y%m%d_%H%M%S'), uuid.uuid4().hex[:6])
+
+
+def row_keys(rows):
+    """Short content hash of each detail row, the same in every workbook the row is carried into.
+
+    Cells are hashed through canonical(), so the key does not change when
+    other rows joining or leaving the pool change a column's dtype. Rows
+    with identical values share a key.
+    """
+    rows = rows.drop(columns=KEY_SKIP, errors='ignore')
+    return [hashlib.sha1('\x1f'.join(map(canonical, row)).encode('utf-8')).hexdigest()[:16]
+            for row in rows.itertuples(index=False, name=None)]
+
+
+def claim_records(all_detail, status, claimed_by, new_unmatched, rt_agg):
+    """Audit records for one match pass, without the run columns.
+
+    One record per claimed detail row (status 'full' or 'partial', the
+    claiming part's RT quantity and whether it matched on IET # or
+    part_number) and one per part with RT quantity left over ('unmatched',
+    the leftover quantity).
+    """
+    claimed_by = np.asarray(claimed_by, dtype=object)
+    pos = np.flatnonzero(claimed_by != '')
+    rows = all_detail.iloc[pos]
+    parts = claimed_by[pos]
+    rt_qty = dict(zip(rt_agg['Part'].tolist(), rt_agg['RT_Qty'].tolist()))
+    return_qty = pd.to_numeric(rows['return_qty'], errors='coerce') if 'return_qty' in rows.columns else pd.Series(np.nan, index=rows.index)
+    claims = pd.DataFrame({
+        'rt_part': parts,
+        'rt_qty': [int(rt_qty[p]) for p in parts],
+        'status': np.asarray(status, dtype=object)[pos],
+        'match_via': np.where(rows['_clean_iet'].to_numpy(dtype=object) == parts, 'IET #', 'part_number'),
+        'row_key': row_keys(rows),
+        'iet': rows['_clean_iet'].to_numpy(dtype=object),
+        'part_number': rows['_clean_pn'].to_numpy(dtype=object),
+        'return_qty': return_qty.to_numpy(dtype=float),
+    })
+    # Unmatched parts carry the '[' suffix; log the cleaned part like the claims
+    excess = pd.DataFrame({
+        'rt_part': clean_parts(pd.Series([r['Part'] for r in new_unmatched], dtype=object)).to_numpy(dtype=object),
+        'rt_qty': [int(r['Qty']) for r in new_unmatched],
+        'status': 'unmatched',
+        'match_via': '',
+        'row_key': '',
+        'iet': '',
+        'part_number': '',
+        'return_qty': np.nan,
+    })
+    return pd.concat([claims, excess], ignore_index=True)
+
+
+class AuditLog:
+    """Append-only folder of per-run match records, one immutable segment file per run.
+
+    Segments are Parquet when pyarrow is installed and gzipped CSV
+    otherwise. Queries read only the columns and rows they need from each
+    segment, so answering "why" never touches the workbooks.
+    """
+
+    def __init__(self, audit_dir):
+        self.audit_dir = audit_dir
+        self.parquet = importlib.util.find_spec('pyarrow') is not None
+
+    def append(self, records, rt_file, run_id=None):
+        """Write records (from claim_records) as a new segment. Returns the run id."""
+        run_id = run_id or new_run_id()
+        records = records.copy()
+        records.insert(0, 'rt_file', os.path.basename(rt_file))
+        records.insert(0, 'run_at', datetime.now().isoformat(timespec='seconds'))
+        records.insert(0, 'run_id', run_id)
+        records = records[COLUMNS]
+        os.makedirs(self.audit_dir, exist_ok=True)
+        if self.parquet:
+            path = os.path.join(self.audit_dir, run_id + '.parquet')
+            save_atomic(path, lambda tmp: records.to_parquet(tmp, index=False))
+        else:
+            path = os.path.join(self.audit_dir, run_id + '.csv.gz')
+            save_atomic(path, lambda tmp: records.to_csv(tmp, index=False, compression='gzip'))
+        return run_id
+
+    def record(self, all_detail, status, claimed_by, new_unmatched, rt_agg, rt_file, run_id=None):
+        return self.append(claim_records(all_detail, status, claimed_by, new_unmatched, rt_agg), rt_file, run_id)
+
+    def segments(self):
+        paths = glob.glob(os.path.join(self.audit_dir, '*.parquet')) + glob.glob(os.path.join(self.audit_dir, '*.csv.gz'))
+        # Run ids start with their timestamp
+        return sorted(paths, key=os.path.basename)
+
+    def history(self, part):
+        """Every record where part was the scanned part or the IET # / part_number of a claimed row, oldest run first."""
+        part = clean_parts(pd.Series([part], dtype=object)).iloc[0]
+        found = []
+        for path in self.segments():
+            if path.endswith('.parquet'):
+                # Pushed down to the row groups: (rt_part == p) or (iet == p) or (part_number == p)
+                df = pd.read_parquet(path, filters=[[(col, '==', part)] for col in ('rt_part', 'iet', 'part_number')])
+            else:
+                df = pd.read_csv(path, dtype={'rt_part': object, 'iet': object, 'part_number': object, 'row_key': object, 'match_via': object},
+                                 keep_default_na=False, na_values={'return_qty': ['']})
+                df = df[(df['rt_part'] == part) | (df['iet'] == part) | (df['part_number'] == part)]
+            found.append(df)
+        if not found:
+            return pd.DataFrame(columns=COLUMNS)
+        return pd.concat(found, ignore_index=True)
+
+    def row_history(self, row_key):
+        """Every claim of one detail row (see row_keys), oldest run first."""
+        found = []
+        for path in self.segments():
+            if path.endswith('.parquet'):
+                df = pd.read_parquet(path, filters=[('row_key', '==', row_key)])
+            else:
+                df = pd.read_csv(path, dtype=object, keep_default_na=False)
+                df = df[df['row_key'] == row_key]
+            found.append(df)
+        if not found:
+            return pd.DataFrame(columns=COLUMNS)
+        return pd.concat(found, ignore_index=True)
+
+
+def explain(history, part):
+    """Plain-language account of a part's audit history, one line per run and claiming part."""
+    if len(history) == 0:
+        return "{}: no audit records".format(part)
+    lines = []
+    for (run_id, run_at, rt_file), run in history.groupby(['run_id', 'run_at', 'rt_file'], sort=False):
+        for status, group in run.groupby('status', sort=False):
+            if status == 'unmatched':
+                lines.append("{} {} ({}): {} scanned, {} left over -> Unmatched".format(run_at, run_id, rt_file, group['rt_part'].iloc[0], int(group['rt_qty'].sum())))
+                continue
+            for (rt_part, via), claims in group.groupby(['rt_part', 'match_via'], sort=False):
+                tab = 'Previously Received' if status == 'full' else 'Ready to Receive'
+                simple_qty = claims['return_qty'].sum()
+                reason = ("RT qty covered the rows' return_qty" if status == 'full'
+                          else "RT qty {} was less than the open rows' return_qty, rows claimed in order".format(int(claims['rt_qty'].iloc[0])))
+                lines.append("{} {} ({}): {} scanned {} claimed {} row(s) via {} (return_qty {:g}) -> {}: {}".format(
+                    run_at, run_id, rt_file, rt_part, int(claims['rt_qty'].iloc[0]), len(claims), via, simple_qty, tab, reason))
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='rt-reconciler-audit', description="Query the match audit log written by cli.py/watch.py --audit.")
+    parser.add_argument('audit_dir', help="Audit folder (default name: {})".format(AUDIT_DIR))
+    parser.add_argument('part', nargs='?', help="Part number to explain: why it is on its tab and which runs claimed it")
+    parser.add_argument('--row', metavar='ROW_KEY', help="Show every claim of one detail row instead")
+    parser.add_argument('--raw', action='store_true', help="Print the matching records instead of the explanation")
+    args = parser.parse_args(argv)
+    if (args.part is None) == (args.row is None):
+        parser.error("give either a part or --row")
+    log = AuditLog(args.audit_dir)
+    if not log.segments():
+        print("Error: no audit segments in {}".format(args.audit_dir), file=sys.stderr)
+        return 1
+    history = log.row_history(args.row) if args.row else log.history(args.part)
+    if args.raw or args.row:
+        print(history.to_string(index=False) if len(history) else "No records")
+    else:
+        print(explain(history, args.part))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,158 @@
+import argparse
+import csv
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from functools import partial
+import ingest
+import reconciler
+import writer
+
+STAT_KEYS = ['total_in', 'remaining', 'ready', 'prev_received', 'unmatched', 'total_out']
+
+
+def read_manifest(manifest_file):
+    """Read (name, simple_file, rt_file, output_file) pairs from a CSV manifest.
+
+    Columns: simple_file, rt_file and optionally name and output_file.
+    Relative paths are resolved against the manifest's folder.
+    """
+    base = os.path.dirname(os.path.abspath(manifest_file))
+    pairs = []
+    with open(manifest_file, newline='') as f:
+        for i, row in enumerate(csv.DictReader(f), start=1):
+            simple_file = os.path.join(base, row['simple_file'].strip())
+            rt_file = os.path.join(base, row['rt_file'].strip())
+            output_file = (row.get('output_file') or '').strip() or None
+            if output_file:
+                output_file = os.path.join(base, output_file)
+            name = (row.get('name') or '').strip() or 'row {}'.format(i)
+            pairs.append((name, simple_file, rt_file, output_file))
+    return pairs
+
+
+def is_simple_workbook(path, engine=None):
+    return 'IE Tire' in ingest.sheet_names(path, engine)
+
+
+def scan_directory(root):
+    """Find one Simple/RT pair per subfolder of root.
+
+    The workbook with an 'IE Tire' sheet is the Simple workbook, the other
+    workbook or .csv file is the RT export. Earlier Reconciled_* outputs are
+    ignored, and a folder with a workbook that cannot be opened is skipped. Returns
+    (pairs, skipped) where skipped lists (name, reason) for unusable folders.
+    """
+    pairs = []
+    skipped = []
+    for name in sorted(os.listdir(root)):
+        folder = os.path.join(root, name)
+        if not os.path.isdir(folder):
+            continue
+        books = [os.path.join(folder, f) for f in sorted(os.listdir(folder))
+                 if f.lower().endswith(ingest.RT_EXTENSIONS) and not f.startswith(('Reconciled_', '~$'))]
+        try:
+            simple = [f for f in books if not ingest.is_csv(f) and is_simple_workbook(f)]
+        except Exception as e:
+            # A corrupt workbook, or an .xls without calamine, only rules out its own folder
+            skipped.append((name, "cannot open workbook: {}: {}".format(type(e).__name__, e)))
+            continue
+        rt = [f for f in books if f not in simple]
+        if len(simple) != 1 or len(rt) != 1:
+            skipped.append((name, "expected one Simple workbook and one RT export, found {}".format([os.path.basename(f) for f in books])))
+            continue
+        pairs.append((name, simple[0], rt[0], None))
+    return pairs, skipped
+
+
+def default_output_file(name, simple_file):
+    # Several pairs may share a folder, so tag the output with the pair name
+    stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    return os.path.join(os.path.dirname(simple_file), "Reconciled_{}_{}.xlsx".format(re.sub(r'[^\w.-]+', '_', name), stamp))
+
+
+def run_pair(pair, xlsx=True, columnar=()):
+    name, simple_file, rt_file, output_file = pair
+    if output_file is None:
+        output_file = default_output_file(name, simple_file)
+    try:
+        result = reconciler.reconcile(simple_file, rt_file, output_file=output_file, xlsx=xlsx, columnar=columnar)
+    except Exception as e:
+        return name, None, None, "{}: {}".format(type(e).__name__, e)
+    return name, ';'.join(result.outputs), result.stats, None
+
+
+def aggregate(stats_list):
+    totals = dict.fromkeys(STAT_KEYS, 0)
+    for stats in stats_list:
+        for key in STAT_KEYS:
+            totals[key] += stats[key]
+    return totals
+
+
+def run_batch(pairs, workers=None, xlsx=True, columnar=()):
+    """Reconcile pairs across a process pool.
+
+    Returns (results, totals): results holds (name, output_file, stats, error)
+    in input order, where output_file joins every file written with ';'.
+    totals sums the stats of the pairs that succeeded.
+    """
+    order = {pair[0]: i for i, pair in enumerate(pairs)}
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(partial(run_pair, xlsx=xlsx, columnar=columnar), pair) for pair in pairs]
+        for future in as_completed(futures):
+            results.append(future.result())
+    results.sort(key=lambda r: order[r[0]])
+    totals = aggregate(r[2] for r in results if r[3] is None)
+    return results, totals
+
+
+def write_summary(results, totals, summary_file, skipped=()):
+    with open(summary_file, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['name'] + STAT_KEYS + ['output_file', 'error'])
+        for name, output_file, stats, error in results:
+            values = [stats[k] for k in STAT_KEYS] if stats else [''] * len(STAT_KEYS)
+            writer.writerow([name] + values + [output_file or '', error or ''])
+        for name, reason in skipped:
+            writer.writerow([name] + [''] * len(STAT_KEYS) + ['', 'SKIPPED {}'.format(reason)])
+        writer.writerow(['TOTAL'] + [totals[k] for k in STAT_KEYS] + ['', ''])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='rt-reconciler-batch', description="Reconcile many Simple/RT file pairs in parallel.")
+    parser.add_argument('source', help="CSV manifest (simple_file, rt_file[, name, output_file]) or a folder with one subfolder per branch")
+    parser.add_argument('-j', '--workers', type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument('--summary', help="Write the per-pair and total stats to this CSV")
+    parser.add_argument('--columnar', action='append', choices=writer.COLUMNAR_FORMATS, default=[], metavar='FORMAT', help="Also write each pair's tabs as {}; repeatable".format('/'.join(writer.COLUMNAR_FORMATS)))
+    parser.add_argument('--no-xlsx', action='store_true', help="Skip the styled workbooks (needs --columnar)")
+    args = parser.parse_args(argv)
+    if args.no_xlsx and not args.columnar:
+        parser.error("--no-xlsx needs at least one --columnar format")
+    skipped = []
+    if os.path.isdir(args.source):
+        pairs, skipped = scan_directory(args.source)
+    else:
+        pairs = read_manifest(args.source)
+    for name, reason in skipped:
+        print("{}: SKIPPED {}".format(name, reason), file=sys.stderr)
+    names = [p[0] for p in pairs]
+    if len(set(names)) != len(names):
+        parser.error("pair names must be unique")
+    results, totals = run_batch(pairs, workers=args.workers, xlsx=not args.no_xlsx, columnar=args.columnar)
+    for name, output_file, stats, error in results:
+        if error:
+            print("{}: FAILED {}".format(name, error))
+        else:
+            print("{}: {} -> {}".format(name, ', '.join('{}={}'.format(k, stats[k]) for k in STAT_KEYS), output_file))
+    print("TOTAL: {}".format(', '.join('{}={}'.format(k, totals[k]) for k in STAT_KEYS)))
+    if args.summary:
+        write_summary(results, totals, args.summary, skipped)
+    return 1 if skipped or any(r[3] for r in results) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,101 @@
+"""Synthetic Simple workbook and RT export generator.
+
+The data exercises every matching path: duplicate IET #s, rows that only
+match through the part_number fallback, trailing '[' and lowercase part
+numbers, blank return_qty, non-numeric RT quantities, parts scanned more
+or less often than they were returned, and scans of unknown parts.
+"""
+import argparse
+import datetime
+import numpy as np
+from openpyxl import Workbook
+
+DETAIL_COLUMNS = ['IET #', 'part_number', 'return_qty', 'description', 'return_date', 'damaged']
+RT_COLUMNS = ['Start DT', 'Part', 'Part Qty']
+# Share of detail rows on each tab
+TAB_SHARES = [('IE Tire', 0.70), ('Ready to Receive', 0.15), ('Previously Received', 0.15)]
+START = datetime.datetime(2024, 1, 1)
+
+
+def part_name(ids):
+    return np.char.add('P', np.char.zfill(ids.astype(str), 6))
+
+
+def detail_rows(rng, n, n_parts):
+    part = part_name(rng.integers(n_parts, size=n))
+    roll = rng.random(n)
+    iet = part.astype(object)
+    # 10% carry an IET # nobody scans, so they only match on part_number
+    iet[roll < 0.10] = np.char.add('X', part[roll < 0.10])
+    iet[(roll >= 0.10) & (roll < 0.18)] = None
+    tail = (roll >= 0.18) & (roll < 0.28)
+    iet[tail] = np.char.add(part[tail], '[')
+    lower = (roll >= 0.28) & (roll < 0.32)
+    iet[lower] = np.char.lower(part[lower])
+    pn = part.astype(object)
+    other = rng.random(n) < 0.15
+    pn[other] = part_name(rng.integers(n_parts, size=int(other.sum())))
+    qty = rng.choice([1.0, 1.0, 2.0, 4.0], size=n)
+    qty[rng.random(n) < 0.05] = np.nan
+    days = rng.integers(0, 120, size=n)
+    damaged = rng.random(n) < 0.1
+    return [iet.tolist(), pn.tolist(), [None if q != q else int(q) for q in qty.tolist()],
+            np.char.add('tire ', part).tolist(), [START + datetime.timedelta(days=d) for d in days.tolist()],
+            damaged.tolist()]
+
+
+def rt_rows(rng, n, n_parts):
+    # Scan a subset of the parts, some of them many times so both over- and under-scans occur
+    scanned = rng.integers(n_parts, size=max(n // 2, 1))
+    ids = rng.choice(scanned, size=n)
+    part = part_name(ids).astype(object)
+    roll = rng.random(n)
+    unknown = roll < 0.05
+    part[unknown] = np.char.add('ZZ', np.char.zfill(rng.integers(n_parts, size=int(unknown.sum())).astype(str), 6))
+    tail = (roll >= 0.05) & (roll < 0.25)
+    part[tail] = np.char.add(part[tail].astype(str), '[')
+    qty = rng.choice([1, 1, 1, 2, 3], size=n).astype(object)
+    qty_roll = rng.random(n)
+    qty[qty_roll < 0.02] = 'x'
+    qty[(qty_roll >= 0.02) & (qty_roll < 0.04)] = None
+    minutes = np.sort(rng.integers(0, 60 * 24 * 30, size=n))
+    return [[START + datetime.timedelta(minutes=m) for m in minutes.tolist()], part.tolist(), qty.tolist()]
+
+
+def write_sheet(wb, name, header, columns):
+    ws = wb.create_sheet(name)
+    ws.append(header)
+    for row in zip(*columns):
+        ws.append(row)
+
+
+def generate(simple_file, rt_file, rows, seed=0):
+    """Write a Simple workbook with about `rows` detail rows and a matching RT export.
+
+    The RT export gets half as many scans as there are detail rows.
+    """
+    rng = np.random.default_rng(seed)
+    n_parts = max(rows // 3, 10)
+    wb = Workbook(write_only=True)
+    for name, share in TAB_SHARES:
+        write_sheet(wb, name, DETAIL_COLUMNS, detail_rows(rng, max(int(rows * share), 1), n_parts))
+    carried = ['ZZ{:06d}['.format(i) for i in rng.integers(n_parts, size=max(rows // 1000, 2)).tolist()]
+    write_sheet(wb, 'Unmatched', ['Part', 'Qty'], [carried, rng.integers(1, 4, size=len(carried)).tolist()])
+    wb.save(simple_file)
+    wb = Workbook(write_only=True)
+    write_sheet(wb, 'Sheet1', RT_COLUMNS, rt_rows(rng, max(rows // 2, 1), n_parts))
+    wb.save(rt_file)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Generate a synthetic Simple workbook and RT export.')
+    parser.add_argument('simple_file')
+    parser.add_argument('rt_file')
+    parser.add_argument('--rows', type=int, default=10000, help='detail rows across all tabs (default: 10000)')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+    generate(args.simple_file, args.rt_file, args.rows, args.seed)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""Golden reference: the original ReconcilerApp.reconcile matching, kept verbatim.
+
+It is O(RT parts x detail rows), so only use it as an oracle on small and
+medium inputs. It stops before writing the workbook and returns the tab
+frames and stats instead.
+"""
+import pandas as pd
+
+
+def clean_part(val):
+    if pd.isna(val):
+        return ''
+    return str(val).strip().rstrip('[').upper()
+
+
+def reconcile(simple_file, rt_file):
+    xl = pd.ExcelFile(simple_file)
+    ie_df = pd.read_excel(xl, sheet_name='IE Tire')
+    # Combine all detail tabs into one pool so no rows get lost
+    all_detail = ie_df.copy()
+    for name in ['Ready_to_Receive', 'Ready to Receive']:
+        if name in xl.sheet_names:
+            all_detail = pd.concat([all_detail, pd.read_excel(xl, sheet_name=name)], ignore_index=True)
+            break
+    for name in ['Previously Received', 'Previously_Received']:
+        if name in xl.sheet_names:
+            all_detail = pd.concat([all_detail, pd.read_excel(xl, sheet_name=name)], ignore_index=True)
+            break
+    # Load existing unmatched scans to carry forward
+    existing_unmatched = pd.DataFrame()
+    for name in ['Unmatched_Scans', 'Unmatched']:
+        if name in xl.sheet_names:
+            existing_unmatched = pd.read_excel(xl, sheet_name=name)
+            break
+    total_in = len(all_detail)
+    all_detail['_clean_iet'] = all_detail['IET #'].apply(clean_part)
+    if 'part_number' in all_detail.columns:
+        all_detail['_clean_pn'] = all_detail['part_number'].apply(clean_part)
+    else:
+        all_detail['_clean_pn'] = ''
+    # Load and aggregate RT scans
+    rt_raw = pd.read_excel(rt_file, sheet_name=0)
+    part_col = None
+    qty_col = None
+    for c in rt_raw.columns:
+        cl = str(c).lower().strip()
+        if cl == 'part':
+            part_col = c
+        elif 'qty' in cl or 'quantity' in cl:
+            qty_col = c
+    if part_col is None:
+        raise ValueError("Cannot find Part column in RT file. Columns: {}".format(rt_raw.columns.tolist()))
+    if qty_col is None:
+        qty_col = '_qty'
+        rt_raw[qty_col] = 1
+    else:
+        rt_raw[qty_col] = pd.to_numeric(rt_raw[qty_col], errors='coerce').fillna(1).astype(int)
+    rt_raw['_clean_part'] = rt_raw[part_col].apply(clean_part)
+    rt_agg = rt_raw.groupby('_clean_part')[qty_col].sum().reset_index()
+    rt_agg.columns = ['Part', 'RT_Qty']
+    rt_agg = rt_agg[rt_agg['Part'] != '']
+    # Match RT scans against detail rows
+    all_detail['_matched'] = False
+    all_detail['_match_status'] = ''
+    new_unmatched = []
+    for _, rt_row in rt_agg.iterrows():
+        rt_part = rt_row['Part']
+        rt_qty = int(rt_row['RT_Qty'])
+        mask_iet = (all_detail['_clean_iet'] == rt_part) & (~all_detail['_matched'])
+        mask_pn = (all_detail['_clean_pn'] == rt_part) & (~all_detail['_matched'])
+        matching_idx = all_detail[mask_iet].index.tolist()
+        if not matching_idx:
+            matching_idx = all_detail[mask_pn].index.tolist()
+        if not matching_idx:
+            new_unmatched.append({'Part': rt_part + '[', 'Qty': rt_qty})
+            continue
+        simple_qty = all_detail.loc[matching_idx, 'return_qty'].sum()
+        simple_qty = int(simple_qty) if pd.notna(simple_qty) else len(matching_idx)
+        if rt_qty >= simple_qty:
+            all_detail.loc[matching_idx, '_matched'] = True
+            all_detail.loc[matching_idx, '_match_status'] = 'full'
+            excess = rt_qty - simple_qty
+            if excess > 0:
+                new_unmatched.append({'Part': rt_part + '[', 'Qty': excess})
+        else:
+            claimed = 0
+            for idx in matching_idx:
+                if claimed >= rt_qty:
+                    break
+                row_qty = all_detail.at[idx, 'return_qty']
+                row_qty = int(row_qty) if pd.notna(row_qty) else 1
+                all_detail.at[idx, '_matched'] = True
+                all_detail.at[idx, '_match_status'] = 'partial'
+                claimed += row_qty
+    # Split into tabs
+    prev_received_df = all_detail[all_detail['_match_status'] == 'full'].copy()
+    ready_df = all_detail[all_detail['_match_status'] == 'partial'].copy()
+    remaining_df = all_detail[~all_detail['_matched']].copy()
+    drop_cols = ['_clean_iet', '_clean_pn', '_matched', '_match_status']
+    prev_received_df = prev_received_df.drop(columns=drop_cols, errors='ignore')
+    ready_df = ready_df.drop(columns=drop_cols, errors='ignore')
+    remaining_df = remaining_df.drop(columns=drop_cols, errors='ignore')
+    # Build unmatched tab - carry forward existing + add new
+    new_unmatched_df = pd.DataFrame(new_unmatched)
+    if len(existing_unmatched) > 0 and len(new_unmatched_df) > 0:
+        for col in existing_unmatched.columns:
+            if col not in new_unmatched_df.columns:
+                new_unmatched_df[col] = ''
+        new_unmatched_df = new_unmatched_df[existing_unmatched.columns]
+        unmatched_df = pd.concat([existing_unmatched, new_unmatched_df], ignore_index=True)
+        unmatched_df = unmatched_df.drop_duplicates(subset=['Part'], keep='first')
+    elif len(existing_unmatched) > 0:
+        unmatched_df = existing_unmatched
+    elif len(new_unmatched_df) > 0:
+        unmatched_df = new_unmatched_df
+    else:
+        unmatched_df = pd.DataFrame(columns=['Part', 'Qty'])
+    total_out = len(remaining_df) + len(ready_df) + len(prev_received_df)
+    stats = {'total_in': total_in, 'remaining': len(remaining_df), 'ready': len(ready_df), 'prev_received': len(prev_received_df), 'unmatched': len(unmatched_df), 'total_out': total_out}
+    frames = {'IE Tire': remaining_df, 'Ready to Receive': ready_df, 'Unmatched': unmatched_df, 'Previously Received': prev_received_df}
+    return frames, stats
@@ -0,0 +1,93 @@
+"""Benchmark the reconcile pipeline on synthetic data of increasing size.
+
+    python -m benchmarks.run --sizes 1000,10000,100000,1000000
+
+Each size is generated once into the work directory, reconciled with the
+stage profiler active, and (up to --check-max rows) compared tab by tab
+against the original row-by-row implementation in benchmarks.reference.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import pandas as pd
+import ingest
+import reconciler
+from profiling import Profiler, activate
+from benchmarks import reference
+from benchmarks.generate import generate
+
+DEFAULT_SIZES = '1000,10000,100000'
+# The reference is quadratic in the input; past this it takes minutes
+DEFAULT_CHECK_MAX = 20000
+
+
+def compare_frames(frames, expected):
+    """Raise AssertionError naming the first tab that differs from the reference."""
+    for name, exp in expected.items():
+        got = frames[name].reset_index(drop=True)
+        exp = exp.reset_index(drop=True)
+        try:
+            pd.testing.assert_frame_equal(got, exp, check_dtype=False, check_index_type=False, check_column_type=False)
+        except AssertionError as e:
+            raise AssertionError('{}: {}'.format(name, e))
+
+
+def bench(rows, work_dir, engine=None, check=True, trace_memory=False, seed=0):
+    simple_file = os.path.join(work_dir, 'simple_{}.xlsx'.format(rows))
+    rt_file = os.path.join(work_dir, 'rt_{}.xlsx'.format(rows))
+    if not (os.path.exists(simple_file) and os.path.exists(rt_file)):
+        start = time.perf_counter()
+        generate(simple_file, rt_file, rows, seed)
+        print('generated {} rows in {:.1f}s'.format(rows, time.perf_counter() - start))
+    profiler = Profiler(trace_memory=trace_memory)
+    with activate(profiler):
+        result = reconciler.reconcile(simple_file, rt_file, os.path.join(work_dir, 'out_{}.xlsx'.format(rows)), engine=engine)
+    record = {'rows': rows, 'stats': result.stats, 'trace': profiler.trace(), 'checked': False}
+    print(profiler.report())
+    if check:
+        start = time.perf_counter()
+        expected_frames, expected_stats = reference.reconcile(simple_file, rt_file)
+        record['reference_s'] = time.perf_counter() - start
+        assert result.stats == expected_stats, (result.stats, expected_stats)
+        compare_frames(result.frames, expected_frames)
+        record['checked'] = True
+        print('matches reference ({:.1f}s)'.format(record['reference_s']))
+    return record
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the reconcile pipeline on synthetic data.')
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help='comma-separated detail row counts (default: {})'.format(DEFAULT_SIZES))
+    parser.add_argument('--work-dir', help='where generated inputs and outputs go; reused between runs (default: a temporary directory)')
+    parser.add_argument('--engine', choices=ingest.ENGINES, default=None)
+    parser.add_argument('--check-max', type=int, default=DEFAULT_CHECK_MAX, metavar='ROWS',
+                        help='compare against the reference implementation up to this many rows (default: {})'.format(DEFAULT_CHECK_MAX))
+    parser.add_argument('--no-check', action='store_true', help='skip the reference comparison')
+    parser.add_argument('--memory', action='store_true', help='trace per-stage Python allocations (slower)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', metavar='JSON_FILE', help='write timings and stats as JSON')
+    args = parser.parse_args(argv)
+    sizes = [int(s) for s in args.sizes.split(',') if s.strip()]
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix='rt_bench_')
+    os.makedirs(work_dir, exist_ok=True)
+    records = []
+    failed = False
+    for rows in sizes:
+        print('== {} rows'.format(rows))
+        try:
+            records.append(bench(rows, work_dir, engine=args.engine, check=not args.no_check and rows <= args.check_max,
+                                 trace_memory=args.memory, seed=args.seed))
+        except AssertionError as e:
+            print('MISMATCH: {}'.format(e), file=sys.stderr)
+            failed = True
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(records, f, indent=2, default=str)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
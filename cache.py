@@ -0,0 +1,112 @@
+import hashlib
+import importlib.util
+import json
+import os
+import pandas as pd
+
+# Bump when the cached frames change shape (e.g. normalization rules)
+CACHE_VERSION = 2
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+def default_cache_dir():
+    base = os.environ.get('LOCALAPPDATA') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'RT_Reconciler', 'cache')
+
+
+class SheetCache:
+    """On-disk cache of parsed, normalized sheets keyed on workbook content hash + sheet name.
+
+    Frames are stored as Parquet when pyarrow is installed and pickled
+    otherwise (or when a frame has mixed-type columns Parquet cannot hold).
+    Entries are evicted least-recently-used first once the cache grows past
+    max_bytes; a hit refreshes the entry's mtime.
+    """
+
+    def __init__(self, cache_dir=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.max_bytes = max_bytes
+        self.parquet = importlib.util.find_spec('pyarrow') is not None
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def key(self, digest, sheet):
+        sheet_key = hashlib.sha1(str(sheet).encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.cache_dir, 'v{}-{}-{}'.format(CACHE_VERSION, digest, sheet_key))
+
+    @staticmethod
+    def touch(path):
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    def get_sheet_names(self, digest):
+        path = self.key(digest, '') + '.json'
+        try:
+            with open(path) as f:
+                names = json.load(f)
+        except (OSError, ValueError):
+            return None
+        self.touch(path)
+        return names
+
+    def put_sheet_names(self, digest, names):
+        with open(self.key(digest, '') + '.json', 'w') as f:
+            json.dump(list(names), f)
+
+    def get(self, digest, sheet):
+        """Return the cached frame, or None on a miss."""
+        base = self.key(digest, sheet)
+        for ext, read in (('.parquet', pd.read_parquet), ('.pkl', pd.read_pickle)):
+            path = base + ext
+            if not os.path.exists(path):
+                continue
+            try:
+                df = read(path)
+            except Exception:
+                # A truncated or unreadable entry is just a miss
+                continue
+            self.touch(path)
+            return df
+        return None
+
+    def put(self, digest, sheet, df):
+        base = self.key(digest, sheet)
+        tmp = base + '.tmp'
+        ext = '.pkl'
+        if self.parquet:
+            try:
+                df.to_parquet(tmp)
+                ext = '.parquet'
+            except Exception:
+                pass
+        if ext == '.pkl':
+            df.to_pickle(tmp)
+        os.replace(tmp, base + ext)
+        self.evict()
+
+    def evict(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+        total = sum(e[1] for e in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+
+    def clear(self):
+        for name in os.listdir(self.cache_dir):
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except OSError:
+                pass
@@ -0,0 +1,91 @@
+import argparse
+import contextlib
+import sqlite3
+import sys
+import audit
+import cache
+import ingest
+import profiling
+import reconciler
+import state
+import writer
+
+
+def print_stats(outputs, stats, labels=reconciler.RowClaim.stat_labels):
+    for key, label in labels:
+        print("{}: {}".format(label, stats[key]))
+    for path in outputs:
+        print("Output: {}".format(path))
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='rt-reconciler', description="Reconcile a Simple workbook against an RT scan export without the GUI.")
+    parser.add_argument('simple_file', help="Simple workbook (.xlsx)")
+    parser.add_argument('rt_file', help="RT scan export (.xlsx or .csv)")
+    parser.add_argument('-o', '--output', help="Output workbook (default: Reconciled_<timestamp>.xlsx next to the Simple workbook)")
+    parser.add_argument('--strategy', choices=list(reconciler.STRATEGIES), default='row-claim', help="row-claim: claim detail rows and carry the tabs forward (default); aggregate: compare per-part quantity totals")
+    parser.add_argument('--suggest', action='store_true', help="Add a Possible Matches tab proposing near-miss detail rows (separators, leading zeros, prefixes, typos) for unmatched parts")
+    parser.add_argument('--columnar', action='append', choices=writer.COLUMNAR_FORMATS, default=[], metavar='FORMAT', help="Also write the tabs as {} next to the output (one file per tab, or one SQLite file); repeatable".format('/'.join(writer.COLUMNAR_FORMATS)))
+    parser.add_argument('--no-xlsx', action='store_true', help="Skip the styled workbook, the slowest stage (needs --columnar)")
+    parser.add_argument('--engine', choices=ingest.ENGINES, default='auto', help="Excel reader (default: calamine when installed, else openpyxl)")
+    parser.add_argument('--parallel-load', action='store_true', help="Parse the Simple workbook's sheets in parallel processes")
+    parser.add_argument('--stream-rt', action='store_true', help="Aggregate the RT export chunk by chunk in bounded memory (for very large exports)")
+    parser.add_argument('--state', nargs='?', const='', metavar='STATE_FILE', help="Incremental mode: keep claimed rows and applied scans in a SQLite store (default: {} next to the Simple workbook) and only match new scans".format(state.STATE_FILE))
+    parser.add_argument('--audit', nargs='?', const='', metavar='AUDIT_DIR', help="Append which RT part claimed which detail row, and via IET # or part_number, to an audit log (default: {} next to the Simple workbook); query it with audit.py".format(audit.AUDIT_DIR))
+    parser.add_argument('--cache', action='store_true', help="Cache the parsed Simple workbook by content hash so re-runs skip Excel parsing")
+    parser.add_argument('--cache-dir', help="Cache folder (default: {})".format(cache.default_cache_dir()))
+    parser.add_argument('--cache-size', type=int, default=cache.DEFAULT_MAX_BYTES // (1024 * 1024), metavar='MB', help="Evict least recently used entries beyond this size (default: %(default)s MB)")
+    parser.add_argument('--profile', action='store_true', help="Print wall time, rows and peak RSS for each stage")
+    parser.add_argument('--profile-memory', action='store_true', help="Like --profile, plus each stage's peak Python allocation via tracemalloc (slower)")
+    parser.add_argument('--trace', metavar='JSON_FILE', help="Write the stage timings as a JSON trace (implies --profile)")
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.no_xlsx and not args.columnar:
+        parser.error("--no-xlsx needs at least one --columnar format")
+    if args.state is not None and args.suggest:
+        parser.error("--suggest is not supported with --state")
+    if args.audit is not None and (args.state is not None or args.strategy != 'row-claim'):
+        parser.error("--audit needs the row-claim strategy without --state")
+    if args.state is not None and args.strategy != 'row-claim':
+        parser.error("--state only supports the row-claim strategy")
+    sheet_cache = None
+    if args.cache or args.cache_dir:
+        sheet_cache = cache.SheetCache(args.cache_dir, max_bytes=args.cache_size * 1024 * 1024)
+    profiler = None
+    if args.profile or args.profile_memory or args.trace:
+        profiler = profiling.Profiler(trace_memory=args.profile_memory)
+    try:
+        with profiling.activate(profiler) if profiler else contextlib.nullcontext():
+            result = run(args, sheet_cache)
+    except (OSError, ValueError, KeyError, sqlite3.Error) as e:
+        print("Error: {}".format(e), file=sys.stderr)
+        return 1
+    labels = reconciler.STRATEGIES[args.strategy].stat_labels
+    if args.suggest:
+        labels = labels + [('suggested', 'Unmatched with possible matches')]
+    print_stats(result.outputs, result.stats, labels)
+    if profiler:
+        print(profiler.report(), file=sys.stderr)
+        if args.trace:
+            profiler.write_trace(args.trace)
+    return 0
+
+
+def audit_log(args):
+    if args.audit is None:
+        return None
+    return audit.AuditLog(args.audit or audit.default_audit_dir(args.simple_file))
+
+
+def run(args, sheet_cache):
+    if args.state is not None:
+        return state.reconcile_incremental(args.simple_file, args.rt_file, state_file=args.state or None, output_file=args.output, engine=args.engine, xlsx=not args.no_xlsx, columnar=args.columnar)
+    return reconciler.reconcile(args.simple_file, args.rt_file, output_file=args.output, engine=args.engine, parallel_load=args.parallel_load, cache=sheet_cache, stream_rt=args.stream_rt, xlsx=not args.no_xlsx, columnar=args.columnar, strategy=args.strategy, suggest=args.suggest, audit=audit_log(args))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,134 @@
+from collections import Counter
+import numpy as np
+import pandas as pd
+from normalize import clean_parts
+
+SUGGESTION_COLUMNS = ['Part', 'Qty', 'Candidate', 'Matched Via', 'Method', 'Distance', 'Rows', 'Simple_Qty']
+GRAM = 3
+MAX_DISTANCE = 2
+MAX_SUGGESTIONS = 3
+# Keys sharing the most grams with a part that get an edit-distance check
+MAX_CHECKED = 50
+# Grams found in more keys than this say nothing about a part and are not looked up
+MAX_POSTING = 2000
+# Shortest key that still counts as the tail or head of a longer one (vendor prefixes)
+MIN_AFFIX = 4
+# Method ranks: a separator/leading-zero difference beats an affix beats typos
+METHODS = {'normalized': 0, 'affix': 1, 'edit': 2}
+
+
+def loose_keys(parts):
+    """Cleaned part numbers with separators and leading zeros dropped: '00-123 45' -> '12345'."""
+    return pd.Series(parts, dtype=object).str.replace(r'[^0-9A-Z]', '', regex=True).str.lstrip('0')
+
+
+def grams(key):
+    padded = '^' + key + '$'
+    return {padded[i:i + GRAM] for i in range(max(len(padded) - GRAM + 1, 1))}
+
+
+def edit_distance(a, b, limit):
+    """Levenshtein distance between a and b, or limit + 1 once it is known to exceed limit."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, start=1):
+        cur = [i]
+        for j, cb in enumerate(b, start=1):
+            cur.append(min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb)))
+        if min(cur) > limit:
+            return limit + 1
+        prev = cur
+    return prev[-1]
+
+
+class CandidateIndex:
+    """Near-miss lookup over detail rows: loose-key buckets plus a gram index of the loose keys.
+
+    Built once; each lookup only checks the keys that share grams with the
+    part instead of every detail row.
+    """
+
+    def __init__(self, clean_iet, clean_pn, qty):
+        # (field, clean key) -> [row qty, ...] for every non-blank key
+        self.rows = {}
+        for field, keys in (('IET #', clean_iet), ('part_number', clean_pn)):
+            for key, row_qty in zip(keys, qty):
+                if key:
+                    self.rows.setdefault((field, key), []).append(row_qty)
+        clean = pd.Index([key for _, key in self.rows], dtype=object)
+        # loose key -> [(field, clean key), ...]
+        self.by_loose = {}
+        for entry, loose in zip(self.rows, loose_keys(clean).tolist()):
+            if loose:
+                self.by_loose.setdefault(loose, []).append(entry)
+        self.loose = list(self.by_loose)
+        self.postings = {}
+        for pos, loose in enumerate(self.loose):
+            for gram in grams(loose):
+                self.postings.setdefault(gram, []).append(pos)
+
+    def lookup(self, loose, max_distance=MAX_DISTANCE):
+        """Candidate loose keys for a part's loose key as [(rank, distance, loose key)], best first."""
+        found = {}
+        if loose in self.by_loose:
+            found[loose] = (METHODS['normalized'], 0)
+        shared = Counter()
+        for gram in grams(loose):
+            posting = self.postings.get(gram, ())
+            if len(posting) <= MAX_POSTING:
+                shared.update(posting)
+        for pos, _ in shared.most_common(MAX_CHECKED):
+            key = self.loose[pos]
+            if key in found:
+                continue
+            short, long = sorted((key, loose), key=len)
+            if len(short) >= MIN_AFFIX and (long.endswith(short) or long.startswith(short)):
+                found[key] = (METHODS['affix'], len(long) - len(short))
+                continue
+            distance = edit_distance(loose, key, max_distance)
+            if distance <= max_distance:
+                found[key] = (METHODS['edit'], distance)
+        return sorted((rank, distance, key) for key, (rank, distance) in found.items())
+
+    def suggest(self, part, loose, max_suggestions=MAX_SUGGESTIONS, max_distance=MAX_DISTANCE):
+        """Likely detail keys for a part as dicts of SUGGESTION_COLUMNS minus Part/Qty."""
+        names = {rank: name for name, rank in METHODS.items()}
+        out = []
+        for rank, distance, key in self.lookup(loose, max_distance):
+            for field, clean in self.by_loose[key]:
+                if clean == part:
+                    continue
+                qtys = self.rows[(field, clean)]
+                out.append({'Candidate': clean, 'Matched Via': field, 'Method': names[rank], 'Distance': distance,
+                            'Rows': len(qtys), 'Simple_Qty': int(np.nansum(qtys))})
+                if len(out) == max_suggestions:
+                    return out
+        return out
+
+
+def suggest_matches(detail, unmatched, max_suggestions=MAX_SUGGESTIONS, max_distance=MAX_DISTANCE):
+    """Propose detail rows for the unmatched scans.
+
+    detail holds the rows still open to a scan (IET #, optional part_number
+    and return_qty); unmatched has a Part column and a Qty or RT_Qty column.
+    Each unmatched part gets up to max_suggestions detail keys whose loose
+    form (no separators or leading zeros) is equal, is the head or tail of
+    the part's or the other way round, or is within max_distance edits.
+    Returns one row per suggestion with SUGGESTION_COLUMNS.
+    """
+    if len(unmatched) == 0:
+        return pd.DataFrame(columns=SUGGESTION_COLUMNS)
+    qty = pd.to_numeric(detail['return_qty'], errors='coerce').to_numpy(dtype=float) if 'return_qty' in detail.columns else np.zeros(len(detail))
+    keys = [clean_parts(detail[col]).tolist() if col in detail.columns else [''] * len(detail) for col in ('IET #', 'part_number')]
+    index = CandidateIndex(keys[0], keys[1], qty)
+    qty_col = next((col for col in ('Qty', 'RT_Qty') if col in unmatched.columns), None)
+    parts = clean_parts(unmatched['Part'])
+    scan_qty = unmatched[qty_col].tolist() if qty_col is not None else [None] * len(unmatched)
+    records = []
+    for shown, part, loose, part_qty in zip(unmatched['Part'].tolist(), parts.tolist(), loose_keys(parts).tolist(), scan_qty):
+        if not loose:
+            continue
+        for suggestion in index.suggest(part, loose, max_suggestions, max_distance):
+            records.append(dict(suggestion, Part=shown, Qty=part_qty))
+    return pd.DataFrame(records, columns=SUGGESTION_COLUMNS)
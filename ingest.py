@@ -0,0 +1,187 @@
+import csv
+import hashlib
+import importlib.util
+import os
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+from openpyxl import load_workbook
+from openpyxl.cell.cell import ERROR_CODES
+from pandas.io.parsers import TextParser
+
+ENGINES = ['auto', 'calamine', 'openpyxl']
+CSV_EXTENSIONS = ('.csv', '.txt')
+# What an RT export found by folder scanning can be; a stray .txt is more likely a readme
+RT_EXTENSIONS = ('.xlsx', '.xls', '.csv')
+# Rows per chunk when streaming an RT export
+CHUNK_ROWS = 50000
+
+
+def resolve_engine(engine=None):
+    """Pick the Excel reader: python-calamine when installed, openpyxl otherwise."""
+    if engine in (None, 'auto'):
+        return 'calamine' if importlib.util.find_spec('python_calamine') is not None else 'openpyxl'
+    if engine not in ENGINES:
+        raise ValueError("Unknown Excel engine {!r}, expected one of {}".format(engine, ENGINES))
+    return engine
+
+
+def file_digest(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def is_csv(path):
+    return os.path.splitext(path)[1].lower() in CSV_EXTENSIONS
+
+
+def sheet_names(path, engine=None):
+    with pd.ExcelFile(path, engine=resolve_engine(engine)) as xl:
+        return xl.sheet_names
+
+
+def read_sheet(path, sheet_name, engine=None, usecols=None):
+    if is_csv(path):
+        return pd.read_csv(path, usecols=usecols, encoding='utf-8-sig')
+    return pd.read_excel(path, sheet_name=sheet_name, engine=resolve_engine(engine), usecols=usecols)
+
+
+def read_sheets(path, names, engine=None, parallel=False):
+    """Read several sheets of one workbook into {name: DataFrame}.
+
+    With parallel=True each sheet is parsed in its own process; parsing is
+    CPU-bound and holds the GIL, so threads would not overlap. This only
+    pays off for large sheets, since every worker has to start up and
+    reopen the workbook.
+    """
+    engine = resolve_engine(engine)
+    if not parallel or len(names) < 2:
+        with pd.ExcelFile(path, engine=engine) as xl:
+            return {name: pd.read_excel(xl, sheet_name=name) for name in names}
+    with ProcessPoolExecutor(max_workers=len(names)) as pool:
+        futures = {name: pool.submit(read_sheet, path, name, engine) for name in names}
+        return {name: future.result() for name, future in futures.items()}
+
+
+def find_rt_columns(columns):
+    """Locate the Part and quantity columns of an RT export header by position."""
+    part_pos = None
+    qty_pos = None
+    for i, c in enumerate(columns):
+        cl = str(c).lower().strip()
+        if cl == 'part':
+            part_pos = i
+        elif 'qty' in cl or 'quantity' in cl:
+            qty_pos = i
+    return part_pos, qty_pos
+
+
+def read_rt(path, engine=None):
+    """Read only the Part and quantity columns of an RT export.
+
+    Returns (rt_raw, part_col, qty_col); qty_col is None when the export has
+    no quantity column.
+    """
+    if is_csv(path):
+        header = pd.read_csv(path, nrows=0, encoding='utf-8-sig')
+    else:
+        engine = resolve_engine(engine)
+        header = pd.read_excel(path, sheet_name=0, engine=engine, nrows=0)
+    part_pos, qty_pos = find_rt_columns(header.columns)
+    if part_pos is None:
+        raise ValueError("Cannot find Part column in RT file. Columns: {}".format(header.columns.tolist()))
+    usecols = [part_pos] if qty_pos is None else sorted([part_pos, qty_pos])
+    rt_raw = read_sheet(path, 0, engine, usecols=usecols)
+    # Keep the full-header names so de-duplicated labels like 'Qty.1' survive the projection
+    rt_raw.columns = [header.columns[i] for i in usecols]
+    part_col = header.columns[part_pos]
+    qty_col = header.columns[qty_pos] if qty_pos is not None else None
+    return rt_raw, part_col, qty_col
+
+
+def excel_cell(value):
+    """Convert a read-only openpyxl cell value the way pandas.read_excel does before type inference."""
+    if value is None or value in ERROR_CODES:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def iter_rows(path):
+    """Yield the first sheet's rows one at a time without loading the sheet.
+
+    xlsx rows come from openpyxl in read-only mode, CSV rows from the csv
+    module as raw strings. Blank rows are dropped the way read_csv /
+    read_excel drop them: empty CSV lines anywhere, and all-empty xlsx rows
+    at the end of the sheet (formatted but empty rows often trail it).
+    """
+    if is_csv(path):
+        with open(path, newline='', encoding='utf-8-sig') as f:
+            for row in csv.reader(f):
+                if row:
+                    yield row
+        return
+    wb = load_workbook(path, read_only=True, data_only=True, keep_links=False)
+    try:
+        # Empty rows are held back until a row with data follows them
+        blank = []
+        for row in wb.worksheets[0].iter_rows(values_only=True):
+            row = [excel_cell(v) for v in row]
+            if all(v == '' for v in row):
+                blank.append(row)
+                continue
+            yield from blank
+            blank = []
+            yield row
+    finally:
+        wb.close()
+
+
+def stream_rt(path, chunk_rows=CHUNK_ROWS):
+    """Stream the Part and quantity columns of an RT export in chunks.
+
+    Returns (part_col, qty_col, chunks), where chunks yields (parts, qtys)
+    lists of raw cell values at most chunk_rows long; qtys is None when the
+    export has no quantity column. Parse the collected values with
+    parse_column() to get the types pandas.read_excel would have inferred.
+    """
+    rows = iter_rows(path)
+    header = next(rows, [])
+    part_pos, qty_pos = find_rt_columns(header)
+    if part_pos is None:
+        rows.close()
+        raise ValueError("Cannot find Part column in RT file. Columns: {}".format(list(header)))
+
+    def cell(row, pos):
+        return row[pos] if pos < len(row) else ''
+
+    def chunks():
+        parts = []
+        qtys = None if qty_pos is None else []
+        for row in rows:
+            parts.append(cell(row, part_pos))
+            if qtys is not None:
+                qtys.append(cell(row, qty_pos))
+            if len(parts) >= chunk_rows:
+                yield parts, qtys
+                parts = []
+                qtys = None if qty_pos is None else []
+        if parts:
+            yield parts, qtys
+
+    return header[part_pos], (header[qty_pos] if qty_pos is not None else None), chunks()
+
+
+def parse_column(values):
+    """Parse raw cell values as one column, with read_excel's missing-value handling and type inference.
+
+    Inference depends only on which kinds of value occur, so parsing the
+    distinct values of a column gives each of them the type it would get
+    in the full column.
+    """
+    if not values:
+        return pd.Series([], dtype=object)
+    return TextParser([[v] for v in values], header=None, skip_blank_lines=False).read()[0]
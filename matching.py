@@ -0,0 +1,195 @@
+import numpy as np
+import pandas as pd
+from profiling import progress
+
+# Parts between progress reports in the one-by-one claim loop
+PROGRESS_PARTS = 1000
+
+
+class MatchIndex:
+    """IET # / part_number -> row position lists, consumed as rows are claimed."""
+
+    def __init__(self, clean_iet, clean_pn):
+        self.by_iet = self.build(clean_iet)
+        self.by_pn = self.build(clean_pn)
+        self.matched = [False] * len(clean_iet)
+
+    @staticmethod
+    def build(keys):
+        index = {}
+        for pos, key in enumerate(keys):
+            index.setdefault(key, []).append(pos)
+        return index
+
+    def open_rows(self, index, part):
+        rows = index.get(part)
+        if not rows:
+            return []
+        rows = [pos for pos in rows if not self.matched[pos]]
+        # Claimed rows never come back, so drop them from the list for good
+        index[part] = rows
+        return rows
+
+    def candidates(self, part):
+        """Unclaimed rows for a part: IET # matches first, part_number as fallback."""
+        rows = self.open_rows(self.by_iet, part)
+        if not rows:
+            rows = self.open_rows(self.by_pn, part)
+        return rows
+
+    def claim(self, rows):
+        for pos in rows:
+            self.matched[pos] = True
+
+
+def claim_in_order(index, qty, parts, rt_qtys, status, claimed_by, excess, done=0):
+    """Claim rows for parts one at a time through a MatchIndex, in the given order.
+
+    index positions are positions into qty/status/claimed_by. Leftover RT
+    quantities go into excess as {part: qty}. Progress is reported as done
+    plus the candidate rows looked at so far.
+    """
+    for i, (rt_part, rt_qty) in enumerate(zip(parts, rt_qtys)):
+        if i % PROGRESS_PARTS == 0:
+            progress(done)
+        rt_qty = int(rt_qty)
+        rows = index.candidates(rt_part)
+        done += len(rows)
+        if not rows:
+            excess[rt_part] = rt_qty
+            continue
+        simple_qty = sum(qty[pos] for pos in rows if pd.notna(qty[pos]))
+        simple_qty = int(simple_qty)
+        if rt_qty >= simple_qty:
+            index.claim(rows)
+            for pos in rows:
+                status[pos] = 'full'
+                claimed_by[pos] = rt_part
+            if rt_qty > simple_qty:
+                excess[rt_part] = rt_qty - simple_qty
+        else:
+            claimed = 0
+            for pos in rows:
+                if claimed >= rt_qty:
+                    break
+                row_qty = qty[pos]
+                row_qty = int(row_qty) if pd.notna(row_qty) else 1
+                index.matched[pos] = True
+                status[pos] = 'partial'
+                claimed_by[pos] = rt_part
+                claimed += row_qty
+
+
+def entangled_parts(iet_code, pn_code, n_parts):
+    """Flag RT parts whose candidate rows depend on the order parts are matched in.
+
+    A row is only ever claimed by a part other than its IET # part through
+    the part_number fallback, which a part takes when it has no open IET #
+    rows. Starting from the parts with no IET # rows at all, any part whose
+    IET # rows such a fallback could reach may itself end up falling back,
+    so the set grows until stable. Rows reachable both ways are contested;
+    every part touching one is entangled. All other parts see exactly their
+    own rows whatever order the parts are matched in.
+    """
+    has_iet = np.zeros(n_parts, dtype=bool)
+    has_iet[iet_code[iet_code >= 0]] = True
+    may_fall_back = ~has_iet
+    both = (iet_code >= 0) & (pn_code >= 0) & (iet_code != pn_code)
+    while True:
+        contested = both.copy()
+        contested[both] = may_fall_back[pn_code[both]]
+        reached = iet_code[contested]
+        if may_fall_back[reached].all():
+            break
+        may_fall_back[reached] = True
+    entangled = np.zeros(n_parts, dtype=bool)
+    entangled[iet_code[contested]] = True
+    entangled[pn_code[contested]] = True
+    return entangled, has_iet
+
+
+def key_codes(parts, keys):
+    """parts.get_indexer(keys), looked up once per category when keys is categorical."""
+    if isinstance(keys.dtype, pd.CategoricalDtype):
+        return parts.get_indexer(keys.cat.categories).take(keys.cat.codes.to_numpy())
+    return parts.get_indexer(keys)
+
+
+def match_scans(all_detail, rt_agg):
+    """Claim detail rows for each aggregated RT part.
+
+    Parts are matched in rt_agg order. Each claims the unclaimed rows whose
+    IET # equals it, or failing that those whose part_number does. If the RT
+    quantity covers the rows' summed return_qty they are all 'full' and any
+    surplus goes to new_unmatched; otherwise rows are claimed 'partial' in
+    order until the RT quantity is used up (blank return_qty counts as 1).
+
+    Parts whose rows no other part can reach (see entangled_parts) are
+    claimed for all at once with per-part sums and a cumulative-sum cut-off;
+    the rest go through MatchIndex one by one. Non-integral or non-numeric
+    return_qty sends every part the one-by-one way, so sums are accumulated
+    in the same order as always.
+
+    Returns (matched, status, claimed_by, new_unmatched) where matched,
+    status and claimed_by are arrays aligned with all_detail rows: status is
+    '', 'full' or 'partial' and claimed_by the RT part that claimed the row.
+    """
+    n = len(all_detail)
+    parts = pd.Index(rt_agg['Part'].tolist(), dtype=object)
+    rt_qty = rt_agg['RT_Qty'].to_numpy().astype(np.int64)
+    iet_code = key_codes(parts, all_detail['_clean_iet'])
+    pn_code = key_codes(parts, all_detail['_clean_pn'])
+    qty_col = all_detail['return_qty']
+    qty = qty_col.to_numpy(dtype=float, na_value=np.nan) if qty_col.dtype.kind in 'biuf' else None
+    entangled, has_iet = entangled_parts(iet_code, pn_code, len(parts))
+    known = qty[~np.isnan(qty)] if qty is not None else None
+    if known is None or not (np.isfinite(known).all() and (known == np.round(known)).all() and np.abs(known).sum() < 2 ** 53):
+        entangled[:] = True
+    matched = np.zeros(n, dtype=bool)
+    status = np.full(n, '', dtype=object)
+    claimed_by = np.full(n, '', dtype=object)
+
+    # Every row's only possible claimant is known up front for the independent parts
+    free = ~entangled
+    group = np.full(n, -1)
+    by_iet = iet_code >= 0
+    by_iet[by_iet] = free[iet_code[by_iet]]
+    group[by_iet] = iet_code[by_iet]
+    by_pn = (group < 0) & (pn_code >= 0)
+    by_pn[by_pn] = free[pn_code[by_pn]] & ~has_iet[pn_code[by_pn]]
+    group[by_pn] = pn_code[by_pn]
+    rows = np.flatnonzero(group >= 0)
+    g = group[rows]
+    row_qty = qty[rows] if qty is not None else np.zeros(0)
+    simple_qty = np.bincount(g, weights=np.nan_to_num(row_qty), minlength=len(parts)).astype(np.int64)
+    has_rows = np.bincount(g, minlength=len(parts)) > 0
+    full = rt_qty >= simple_qty
+    row_full = full[g]
+    # Rows are claimed in order while the quantity claimed before them is short of the RT quantity
+    counted = np.where(np.isnan(row_qty), 1, row_qty).astype(np.int64)
+    before = pd.Series(counted).groupby(g).cumsum().to_numpy() - counted
+    stopped = pd.Series(before >= rt_qty[g]).groupby(g).cummax().to_numpy()
+    take = row_full | ~stopped
+    claimed = rows[take]
+    matched[claimed] = True
+    status[claimed] = np.where(row_full[take], 'full', 'partial').astype(object)
+    claimed_by[claimed] = parts.to_numpy()[g[take]]
+    unmatched = free & (~has_rows | (full & (rt_qty > simple_qty)))
+    leftover = np.where(has_rows, rt_qty - simple_qty, rt_qty)
+    excess = dict(zip(parts[unmatched], leftover[unmatched].tolist()))
+
+    if entangled.any():
+        touched = np.flatnonzero((iet_code >= 0) & entangled[np.maximum(iet_code, 0)] | (pn_code >= 0) & entangled[np.maximum(pn_code, 0)])
+        index = MatchIndex(all_detail['_clean_iet'].iloc[touched].tolist(), all_detail['_clean_pn'].iloc[touched].tolist())
+        sub_status = [''] * len(touched)
+        sub_claimed_by = [''] * len(touched)
+        codes = np.flatnonzero(entangled)
+        # Rows no entangled part can reach are settled by the pass above
+        claim_in_order(index, qty_col.to_numpy()[touched].tolist(), parts[codes].tolist(), rt_qty[codes].tolist(), sub_status, sub_claimed_by, excess,
+                       done=n - len(touched))
+        matched[touched] = index.matched
+        status[touched] = sub_status
+        claimed_by[touched] = sub_claimed_by
+
+    new_unmatched = [{'Part': part + '[', 'Qty': excess[part]} for part in parts.tolist() if part in excess]
+    return matched, status, claimed_by, new_unmatched
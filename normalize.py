@@ -0,0 +1,56 @@
+from datetime import date, datetime
+import numpy as np
+import pandas as pd
+
+
+def clean_parts(values, codes=False):
+    """Vectorized clean_part over a whole Series.
+
+    Gives the same strings as values.apply(clean_part), but each distinct
+    value is stringified once and cleaned with the pandas string accessor.
+    With codes=True the result is a categorical Series whose categories are
+    sorted, so grouping or ordering on its integer codes matches grouping or
+    ordering on the cleaned strings.
+    """
+    values = pd.Series(values)
+    missing = values.isna().to_numpy()
+    if values.dtype.kind in 'mM':
+        # astype(str) drops the time part of midnight timestamps, str() does not
+        text = values.map(str, na_action='ignore')
+    elif pd.api.types.infer_dtype(values, skipna=True) in ('string', 'empty'):
+        text = values
+    else:
+        # Stringify before factorizing: 1, 1.0 and True hash equal but print differently
+        text = values.astype(str)
+    raw_codes, uniques = pd.factorize(text)
+    cleaned = np.asarray(pd.Index(uniques, dtype=object).str.strip().str.rstrip('[').str.upper(), dtype=object)
+    if missing.any():
+        # Missing values take a trailing '' slot
+        cleaned = np.append(cleaned, '')
+        raw_codes[missing] = len(cleaned) - 1
+    if not codes:
+        return pd.Series(cleaned.take(raw_codes), index=values.index, dtype=object)
+    clean_codes, categories = pd.factorize(cleaned, sort=True)
+    categorical = pd.Categorical.from_codes(clean_codes.take(raw_codes), categories=categories)
+    return pd.Series(categorical, index=values.index)
+
+
+def canonical(value):
+    """Text for one cell that does not depend on its column's dtype.
+
+    A whole float is written as an int (a blank elsewhere in the column
+    turns 1 into 1.0), missing values as '' and timestamps in one format.
+    """
+    if isinstance(value, str):
+        return value
+    if value is None or value is pd.NaT or (not isinstance(value, (list, tuple)) and pd.isna(value)):
+        return ''
+    if isinstance(value, (bool, np.bool_)):
+        return str(bool(value))
+    if isinstance(value, (int, np.integer)):
+        return str(int(value))
+    if isinstance(value, (float, np.floating)):
+        return str(int(value)) if float(value).is_integer() else repr(float(value))
+    if isinstance(value, (datetime, date, np.datetime64)):
+        return pd.Timestamp(value).strftime('%Y-%m-%d %H:%M:%S.%f')
+    return str(value)
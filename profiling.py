@@ -0,0 +1,223 @@
+import json
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+
+_active = ContextVar('rt_reconciler_profiler', default=None)
+
+
+def _windows_peak_rss():
+    """PeakWorkingSetSize from psapi.GetProcessMemoryInfo, or None if the call fails."""
+    import ctypes
+    from ctypes import wintypes
+
+    class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+        _fields_ = [('cb', wintypes.DWORD), ('PageFaultCount', wintypes.DWORD),
+                    ('PeakWorkingSetSize', ctypes.c_size_t), ('WorkingSetSize', ctypes.c_size_t),
+                    ('QuotaPeakPagedPoolUsage', ctypes.c_size_t), ('QuotaPagedPoolUsage', ctypes.c_size_t),
+                    ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t), ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+                    ('PagefileUsage', ctypes.c_size_t), ('PeakPagefileUsage', ctypes.c_size_t)]
+
+    counters = PROCESS_MEMORY_COUNTERS()
+    counters.cb = ctypes.sizeof(counters)
+    get_process = ctypes.windll.kernel32.GetCurrentProcess
+    get_process.restype = wintypes.HANDLE
+    get_info = ctypes.windll.psapi.GetProcessMemoryInfo
+    get_info.argtypes = [wintypes.HANDLE, ctypes.POINTER(PROCESS_MEMORY_COUNTERS), wintypes.DWORD]
+    get_info.restype = wintypes.BOOL
+    if not get_info(get_process(), ctypes.byref(counters), counters.cb):
+        return None
+    return counters.PeakWorkingSetSize
+
+
+def peak_rss():
+    """Peak resident set size of this process in bytes, or None when it can't be read.
+
+    Uses resource where it exists and the process's peak working set on
+    Windows, where it does not; psutil is only a last resort.
+    """
+    try:
+        import resource
+    except ImportError:
+        if sys.platform == 'win32':
+            try:
+                return _windows_peak_rss()
+            except (OSError, AttributeError):
+                pass
+        try:
+            import psutil
+        except ImportError:
+            return None
+        info = psutil.Process().memory_info()
+        return getattr(info, 'peak_wset', info.rss)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS and kilobytes elsewhere
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class Profiler:
+    """Records wall time, rows and memory for each pipeline stage.
+
+    Stages are recorded while the profiler is active (see activate()).
+    With trace_memory, tracemalloc tracks each stage's peak Python
+    allocation, which slows the run down noticeably.
+    """
+
+    def __init__(self, trace_memory=True):
+        self.trace_memory = trace_memory
+        self.stages = []
+        self.started = datetime.now()
+        self.t0 = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name, rows=None):
+        record = {'stage': name, 'rows': rows}
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record['wall_s'] = time.perf_counter() - start
+            record['peak_alloc_bytes'] = tracemalloc.get_traced_memory()[1] if self.trace_memory else None
+            record['peak_rss_bytes'] = peak_rss()
+            self.stages.append(record)
+
+    def progress(self, done):
+        pass
+
+    def commit(self):
+        pass
+
+    def stop(self):
+        if self.trace_memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def report(self):
+        lines = ['{:<20} {:>9} {:>10} {:>11} {:>10} {:>10}'.format('stage', 'wall s', 'rows', 'rows/s', 'peak MB', 'RSS MB')]
+        for r in self.stages:
+            rate = r['rows'] / r['wall_s'] if r['rows'] and r['wall_s'] > 0 else None
+            lines.append('{:<20} {:>9.3f} {:>10} {:>11} {:>10} {:>10}'.format(
+                r['stage'], r['wall_s'],
+                '' if r['rows'] is None else r['rows'],
+                '' if rate is None else '{:.0f}'.format(rate),
+                _mb(r['peak_alloc_bytes']), _mb(r['peak_rss_bytes'])))
+        lines.append('{:<20} {:>9.3f}'.format('total', time.perf_counter() - self.t0))
+        return '\n'.join(lines)
+
+    def trace(self):
+        return {'started': self.started.isoformat(timespec='seconds'), 'argv': sys.argv,
+                'total_wall_s': time.perf_counter() - self.t0, 'stages': self.stages}
+
+    def write_trace(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.trace(), f, indent=2)
+
+
+class Cancelled(Exception):
+    """Raised inside the pipeline once a ProgressReporter has been cancelled."""
+
+
+class ProgressReporter(Profiler):
+    """Profiler that posts stage progress to a queue for another thread to display.
+
+    Events are ('stage', name, rows) when a stage starts, ('progress', name,
+    rows_done, rows_per_s) at most every `interval` seconds while it runs and
+    ('done', name, rows, wall_s) when it ends. After cancel() the pipeline
+    raises Cancelled when the next stage starts or at the next progress
+    checkpoint, unless the run has already committed a result (see
+    commit()); from then on it runs to the end so a cancel never hides
+    output that was written.
+    """
+
+    def __init__(self, events, interval=0.25):
+        super().__init__(trace_memory=False)
+        self.events = events
+        self.interval = interval
+        self.cancelled = threading.Event()
+        self.committed = False
+        self.current = None
+        self.stage_start = self.last_post = 0.0
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def check(self):
+        if self.cancelled.is_set() and not self.committed:
+            raise Cancelled()
+
+    def commit(self):
+        self.committed = True
+
+    @contextmanager
+    def stage(self, name, rows=None):
+        self.check()
+        self.current = name
+        self.stage_start = self.last_post = time.perf_counter()
+        self.events.put(('stage', name, rows))
+        with super().stage(name, rows) as record:
+            yield record
+        self.events.put(('done', name, record['rows'], record['wall_s']))
+
+    def progress(self, done):
+        self.check()
+        now = time.perf_counter()
+        if now - self.last_post >= self.interval:
+            self.last_post = now
+            self.events.put(('progress', self.current, done, done / (now - self.stage_start)))
+
+
+def _mb(n):
+    return '' if n is None else '{:.1f}'.format(n / (1024 * 1024))
+
+
+@contextmanager
+def activate(profiler):
+    token = _active.set(profiler)
+    try:
+        yield profiler
+    finally:
+        _active.reset(token)
+        profiler.stop()
+
+
+@contextmanager
+def stage(name, rows=None):
+    """Time a pipeline stage on the active profiler; a no-op when none is active.
+
+    Yields a dict the caller can set 'rows' on once the count is known.
+    """
+    profiler = _active.get()
+    if profiler is None:
+        yield {}
+        return
+    with profiler.stage(name, rows) as record:
+        yield record
+
+
+def commit():
+    """Mark that the run is about to leave a result on disk (output, audit segment).
+
+    Called right before the first such write becomes visible; a cancel that
+    comes later is ignored, so a run is only ever reported as cancelled
+    when it wrote nothing.
+    """
+    profiler = _active.get()
+    if profiler is not None:
+        profiler.commit()
+
+
+def progress(done):
+    """Report rows done so far in the current stage to the active profiler.
+
+    Long stages call this periodically; it is also where a cancelled run stops.
+    """
+    profiler = _active.get()
+    if profiler is not None:
+        profiler.progress(done)
@@ -0,0 +1,382 @@
+import os
+from collections import Counter, namedtuple
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import ingest
+from fuzzy import suggest_matches
+from matching import match_scans
+from normalize import clean_parts
+from profiling import progress, stage
+from writer import write_outputs
+
+HELPER_COLS = ['_clean_iet', '_clean_pn', '_matched', '_match_status']
+KEY_COLS = ['_clean_iet', '_clean_pn']
+# _match_status categories: open, fully claimed, partially claimed
+STATUSES = ['', 'full', 'partial']
+READY_SHEETS = ['Ready_to_Receive', 'Ready to Receive']
+PREV_SHEETS = ['Previously Received', 'Previously_Received']
+UNMATCHED_SHEETS = ['Unmatched_Scans', 'Unmatched']
+
+# output_file is the styled workbook (None when skipped); outputs lists every file written
+Result = namedtuple('Result', ['output_file', 'stats', 'frames', 'outputs'])
+
+
+def clean_part(val):
+    """Clean part numbers: strip whitespace, trailing [, uppercase."""
+    if pd.isna(val):
+        return ''
+    return str(val).strip().rstrip('[').upper()
+
+
+def first_present(names, candidates):
+    for name in candidates:
+        if name in names:
+            return name
+    return None
+
+
+def normalize_detail(df):
+    """Add the cleaned _clean_iet/_clean_pn match keys to a detail sheet.
+
+    The keys are categorical and an integer return_qty is narrowed to the
+    smallest integer dtype that holds it, which keeps wide multi-week
+    detail pools small. The narrowing stays inside the pool: output_tab()
+    widens it back for the tabs.
+    """
+    for src, dest in (('IET #', '_clean_iet'), ('part_number', '_clean_pn')):
+        if src in df.columns:
+            df[dest] = clean_parts(df[src], codes=True)
+        else:
+            df[dest] = pd.Categorical.from_codes(np.zeros(len(df), dtype=np.int8), categories=[''])
+    if 'return_qty' in df.columns and df['return_qty'].dtype.kind in 'iu':
+        df['return_qty'] = pd.to_numeric(df['return_qty'], downcast='integer')
+    return df
+
+
+def output_tab(df):
+    """A detail tab with return_qty back at int64, so output schemas do not depend on the run's largest quantity."""
+    if 'return_qty' in df.columns and df['return_qty'].dtype.kind in 'iu' and df['return_qty'].dtype != np.int64:
+        df = df.astype({'return_qty': np.int64})
+    return df
+
+
+def combine_detail(frames):
+    """Stack normalized detail sheets into one pool with a single concat.
+
+    The match keys are given the same categories first, so they stay
+    categorical instead of falling back to object strings.
+    """
+    if len(frames) == 1:
+        return frames[0]
+    for col in KEY_COLS:
+        categories = sorted(set().union(*(f[col].cat.categories for f in frames)))
+        for f in frames:
+            f[col] = f[col].cat.set_categories(categories)
+    return pd.concat(frames, ignore_index=True)
+
+
+def read_simple_sheets(simple_file, engine=None, parallel=False, cache=None, carried=True):
+    """Read the Simple workbook's tabs as {name: DataFrame}, detail tabs already normalized.
+
+    With a SheetCache, sheets parsed from an identical workbook before are
+    served from the cache and the workbook is not opened at all. With
+    carried=False only the IE Tire tab is read.
+    """
+    digest = names = None
+    if cache is not None:
+        with stage('hash simple'):
+            digest = ingest.file_digest(simple_file)
+            names = cache.get_sheet_names(digest)
+    if names is None:
+        with stage('open simple'):
+            names = ingest.sheet_names(simple_file, engine)
+        if cache is not None:
+            cache.put_sheet_names(digest, names)
+    detail_names = ['IE Tire']
+    unmatched_name = None
+    if carried:
+        detail_names += [n for n in (first_present(names, READY_SHEETS), first_present(names, PREV_SHEETS)) if n is not None]
+        unmatched_name = first_present(names, UNMATCHED_SHEETS)
+    wanted = detail_names + ([unmatched_name] if unmatched_name is not None else [])
+    sheets = {}
+    if cache is not None:
+        with stage('cache lookup') as st:
+            for name in wanted:
+                df = cache.get(digest, name)
+                if df is not None:
+                    sheets[name] = df
+            st['rows'] = sum(len(df) for df in sheets.values())
+    missing = [name for name in wanted if name not in sheets]
+    if missing:
+        with stage('read simple') as st:
+            parsed = ingest.read_sheets(simple_file, missing, engine=engine, parallel=parallel)
+            st['rows'] = sum(len(df) for df in parsed.values())
+        with stage('normalize simple') as st:
+            for name in missing:
+                if name in detail_names:
+                    normalize_detail(parsed[name])
+            st['rows'] = sum(len(parsed[name]) for name in missing if name in detail_names)
+        if cache is not None:
+            with stage('cache store'):
+                for name in missing:
+                    cache.put(digest, name, parsed[name])
+        sheets.update(parsed)
+    return sheets, detail_names, unmatched_name
+
+
+def load_simple(simple_file, engine=None, parallel=False, cache=None):
+    """Load the Simple workbook into (all_detail, existing_unmatched)."""
+    sheets, detail_names, unmatched_name = read_simple_sheets(simple_file, engine=engine, parallel=parallel, cache=cache)
+    # Combine all detail tabs into one pool so no rows get lost
+    with stage('combine detail') as st:
+        all_detail = combine_detail([sheets[name] for name in detail_names])
+        st['rows'] = len(all_detail)
+    if 'IET #' not in all_detail.columns:
+        raise KeyError('IET #')
+    # Load existing unmatched scans to carry forward
+    existing_unmatched = sheets[unmatched_name] if unmatched_name is not None else pd.DataFrame()
+    return all_detail, existing_unmatched
+
+
+def carry_forward(frames):
+    """The (all_detail, existing_unmatched) a later run would load from the workbook written from frames.
+
+    Lets a long-running caller keep the carried-forward Simple data in
+    memory instead of re-reading its own output.
+    """
+    with stage('carry forward') as st:
+        all_detail = pd.concat([frames['IE Tire'], frames['Ready to Receive'], frames['Previously Received']], ignore_index=True)
+        normalize_detail(all_detail)
+        st['rows'] = len(all_detail)
+    return all_detail, frames['Unmatched']
+
+
+def load_rt(rt_file, engine=None, stream=False, keep_blank=False):
+    """Load an RT scan export (.xlsx or .csv) and aggregate it into Part / RT_Qty.
+
+    With stream=True the export is never loaded whole; see stream_rt().
+    keep_blank keeps the total of scans with a blank Part as part ''.
+    """
+    if stream:
+        return stream_rt(rt_file, keep_blank=keep_blank)
+    with stage('read rt') as st:
+        rt_raw, part_col, qty_col = ingest.read_rt(rt_file, engine)
+        st['rows'] = len(rt_raw)
+    with stage('aggregate rt', rows=len(rt_raw)):
+        return aggregate_rt(rt_raw, part_col, qty_col, keep_blank)
+
+
+def stream_rt(rt_file, chunk_rows=ingest.CHUNK_ROWS, keep_blank=False):
+    """Aggregate an RT export chunk by chunk into a running per-part total.
+
+    Memory is bounded by the number of distinct part values rather than
+    scans. Totals are kept per raw cell value and only parsed and cleaned
+    once at the end, so the result is the same as load_rt() on the whole
+    export. xlsx files are streamed with openpyxl whatever the engine.
+    """
+    totals = Counter()
+    with stage('stream rt') as st:
+        part_col, qty_col, chunks = ingest.stream_rt(rt_file, chunk_rows)
+        rows = 0
+        for parts, qtys in chunks:
+            parts = pd.Series(parts, dtype=object)
+            if qtys is None:
+                qty = pd.Series(1, index=parts.index)
+            else:
+                qty = pd.to_numeric(pd.Series(qtys, dtype=object), errors='coerce').fillna(1).astype(int)
+            totals.update(qty.groupby(parts, sort=False).sum().to_dict())
+            rows += len(parts)
+            progress(rows)
+        st['rows'] = rows
+    with stage('aggregate rt', rows=len(totals)):
+        raw = pd.DataFrame({'Part': ingest.parse_column(list(totals)), 'RT_Qty': list(totals.values())})
+        return aggregate_rt(raw, 'Part', 'RT_Qty', keep_blank)
+
+
+def aggregate_rt(rt_raw, part_col, qty_col, keep_blank=False):
+    """Sum RT scan quantities per cleaned part into Part / RT_Qty."""
+    if qty_col is None:
+        qty_col = '_qty'
+        rt_raw[qty_col] = 1
+    else:
+        rt_raw[qty_col] = pd.to_numeric(rt_raw[qty_col], errors='coerce').fillna(1).astype(int)
+    # Group on the sorted category codes, which keeps the parts in string order
+    parts = clean_parts(rt_raw[part_col], codes=True)
+    qty = rt_raw[qty_col].groupby(parts.cat.codes.to_numpy()).sum()
+    rt_agg = pd.DataFrame({'Part': parts.cat.categories.take(qty.index).astype(object), 'RT_Qty': qty.to_numpy()})
+    if not keep_blank:
+        rt_agg = rt_agg[rt_agg['Part'] != '']
+    return rt_agg
+
+
+def reconcile_frames(all_detail, existing_unmatched, rt_agg, audit=None, rt_file=''):
+    """Match aggregated RT scans against the detail pool.
+
+    With an audit.AuditLog, every claim of this pass is appended to it as
+    one run for rt_file. Returns (frames, stats) where frames maps each
+    output tab name to its DataFrame.
+    """
+    # Match RT scans against detail rows
+    with stage('match', rows=len(all_detail)):
+        matched, status, claimed_by, new_unmatched = match_scans(all_detail, rt_agg)
+        all_detail['_matched'] = matched
+        all_detail['_match_status'] = pd.Categorical(status, categories=STATUSES)
+    if audit is not None:
+        with stage('audit', rows=len(all_detail)):
+            audit.record(all_detail, status, claimed_by, new_unmatched, rt_agg, rt_file)
+    with stage('split tabs', rows=len(all_detail)):
+        return split_tabs(all_detail, existing_unmatched, new_unmatched)
+
+
+def split_tabs(all_detail, existing_unmatched, new_unmatched):
+    """Split a matched detail pool into the output tabs.
+
+    all_detail carries _matched/_match_status; new_unmatched is a list of
+    {'Part', 'Qty'} records. Returns (frames, stats).
+    """
+    total_in = len(all_detail)
+    # One selection per tab, rows and output columns at once, so each tab is copied only once
+    columns = [c for c in all_detail.columns if c not in HELPER_COLS]
+    status = all_detail['_match_status'].to_numpy()
+    prev_received_df = output_tab(all_detail.loc[status == 'full', columns])
+    ready_df = output_tab(all_detail.loc[status == 'partial', columns])
+    remaining_df = output_tab(all_detail.loc[~all_detail['_matched'].to_numpy(dtype=bool), columns])
+    # Build unmatched tab - carry forward existing + add new
+    new_unmatched_df = pd.DataFrame(new_unmatched)
+    if len(existing_unmatched) > 0 and len(new_unmatched_df) > 0:
+        for col in existing_unmatched.columns:
+            if col not in new_unmatched_df.columns:
+                new_unmatched_df[col] = ''
+        new_unmatched_df = new_unmatched_df[existing_unmatched.columns]
+        unmatched_df = pd.concat([existing_unmatched, new_unmatched_df], ignore_index=True)
+        unmatched_df = unmatched_df.drop_duplicates(subset=['Part'], keep='first')
+    elif len(existing_unmatched) > 0:
+        unmatched_df = existing_unmatched
+    elif len(new_unmatched_df) > 0:
+        unmatched_df = new_unmatched_df
+    else:
+        unmatched_df = pd.DataFrame(columns=['Part', 'Qty'])
+    total_out = len(remaining_df) + len(ready_df) + len(prev_received_df)
+    stats = {'total_in': total_in, 'remaining': len(remaining_df), 'ready': len(ready_df), 'prev_received': len(prev_received_df), 'unmatched': len(unmatched_df), 'total_out': total_out}
+    frames = {'IE Tire': remaining_df, 'Ready to Receive': ready_df, 'Unmatched': unmatched_df, 'Previously Received': prev_received_df}
+    return frames, stats
+
+
+def compare_totals(detail, rt_agg):
+    """Compare each RT part's scanned quantity with the Simple total for its IET # (or part_number).
+
+    rt_agg may hold the blank part, which only counts towards rt_scans.
+    Returns (frames, stats): the IE Tire tab unchanged plus one comparison
+    row per RT part on the Ready to Receive (quantities differ), Unmatched
+    (no Simple quantity) or Previously Received (equal) tab.
+    """
+    rt_scans = int(rt_agg['RT_Qty'].sum())
+    rt_agg = rt_agg[rt_agg['Part'] != '']
+    qty = detail['return_qty']
+    by_iet = qty.groupby(detail['_clean_iet'].to_numpy()).sum()
+    by_pn = qty.groupby(detail['_clean_pn'].to_numpy()).sum()
+    parts = pd.Index(rt_agg['Part'].tolist(), dtype=object)
+    via_iet = parts.isin(by_iet.index)
+    via_pn = ~via_iet & parts.isin(by_pn.index)
+    simple_qty = np.zeros(len(parts), dtype=np.int64)
+    simple_qty[via_iet] = by_iet.reindex(parts[via_iet]).to_numpy().astype(np.int64)
+    simple_qty[via_pn] = by_pn.reindex(parts[via_pn]).to_numpy().astype(np.int64)
+    rt_qty = rt_agg['RT_Qty'].to_numpy().astype(np.int64)
+    diff = simple_qty - rt_qty
+    status = np.select([simple_qty == 0, diff == 0], ['Unmatched', 'Previously Received'], 'Ready to Receive')
+    comparison = pd.DataFrame({'Part': parts, 'Simple_Qty': simple_qty, 'RT_Qty': rt_qty, 'DIFF': diff, 'Status': status,
+                               'Matched Via': np.select([via_iet, via_pn], ['IET #', 'part_number'], '')})
+    tabs = {name: comparison[comparison['Status'] == name].drop(columns=['Status']) for name in ('Ready to Receive', 'Unmatched', 'Previously Received')}
+    frames = {'IE Tire': output_tab(detail.drop(columns=HELPER_COLS, errors='ignore'))}
+    frames.update(tabs)
+    stats = {'rt_scans': rt_scans, 'matched': int(rt_qty[status != 'Unmatched'].sum()), 'ready': len(tabs['Ready to Receive']),
+             'unmatched': len(tabs['Unmatched']), 'received': len(tabs['Previously Received'])}
+    return frames, stats
+
+
+class RowClaim:
+    """Claim individual detail rows for the RT scans and carry the earlier tabs forward."""
+
+    name = 'row-claim'
+    stat_labels = [('total_in', 'Total rows in'), ('remaining', 'IE Tire (not yet scanned)'), ('ready', 'Ready to Receive'),
+                   ('prev_received', 'Previously Received'), ('unmatched', 'Unmatched Scans'), ('total_out', 'Total rows out')]
+
+    def load_simple(self, simple_file, engine=None, parallel=False, cache=None):
+        return load_simple(simple_file, engine=engine, parallel=parallel, cache=cache)
+
+    def load_rt(self, rt_file, engine=None, stream=False):
+        return load_rt(rt_file, engine=engine, stream=stream)
+
+    def compare(self, simple, rt_agg, audit=None, rt_file=''):
+        all_detail, existing_unmatched = simple
+        return reconcile_frames(all_detail, existing_unmatched, rt_agg, audit=audit, rt_file=rt_file)
+
+
+class AggregateCompare:
+    """Compare quantity totals per part between the IE Tire tab and the RT scans."""
+
+    name = 'aggregate'
+    stat_labels = [('rt_scans', 'RT Scans'), ('matched', 'Matched'), ('ready', 'Ready to Receive'),
+                   ('unmatched', 'Unmatched (in RT, not Simple)'), ('received', 'Previously Received')]
+
+    def load_simple(self, simple_file, engine=None, parallel=False, cache=None):
+        sheets, _, _ = read_simple_sheets(simple_file, engine=engine, parallel=parallel, cache=cache, carried=False)
+        if 'IET #' not in sheets['IE Tire'].columns:
+            raise KeyError('IET #')
+        return sheets['IE Tire']
+
+    def load_rt(self, rt_file, engine=None, stream=False):
+        # Scans with a blank Part still count towards the RT Scans total
+        return load_rt(rt_file, engine=engine, stream=stream, keep_blank=True)
+
+    def compare(self, simple, rt_agg, audit=None, rt_file=''):
+        if audit is not None:
+            raise ValueError("The audit log records row claims; the aggregate strategy makes none")
+        with stage('compare', rows=len(rt_agg)):
+            return compare_totals(simple, rt_agg)
+
+
+STRATEGIES = {s.name: s for s in (RowClaim(), AggregateCompare())}
+
+
+def get_strategy(strategy):
+    """Look a strategy up by name; strategy objects are passed through."""
+    if not isinstance(strategy, str):
+        return strategy
+    if strategy not in STRATEGIES:
+        raise ValueError("Unknown strategy {!r}, expected one of {}".format(strategy, list(STRATEGIES)))
+    return STRATEGIES[strategy]
+
+
+def default_output_file(simple_file):
+    return os.path.join(os.path.dirname(simple_file), "Reconciled_{}.xlsx".format(datetime.now().strftime('%Y%m%d_%H%M%S')))
+
+
+def reconcile(simple_file, rt_file, output_file=None, engine=None, parallel_load=False, cache=None, stream_rt=False, xlsx=True, columnar=(),
+              strategy='row-claim', suggest=False, audit=None):
+    """Reconcile a Simple workbook against an RT scan export and write the output workbook.
+
+    engine picks the Excel reader ('auto', 'calamine' or 'openpyxl');
+    parallel_load parses the Simple workbook's sheets in separate processes;
+    cache is an optional cache.SheetCache for the parsed Simple workbook;
+    stream_rt aggregates the RT export in bounded memory. columnar lists
+    extra formats ('parquet', 'csv', 'sqlite') written next to output_file,
+    and xlsx=False skips the styled workbook. strategy is 'row-claim'
+    (claim detail rows, carry the tabs forward) or 'aggregate' (compare
+    per-part totals); see STRATEGIES. suggest adds a Possible Matches tab
+    proposing open detail rows for each unmatched part (see fuzzy). audit
+    is an optional audit.AuditLog that gets this run's claims appended.
+    """
+    strategy = get_strategy(strategy)
+    simple = strategy.load_simple(simple_file, engine=engine, parallel=parallel_load, cache=cache)
+    rt_agg = strategy.load_rt(rt_file, engine=engine, stream=stream_rt)
+    frames, stats = strategy.compare(simple, rt_agg, audit=audit, rt_file=rt_file)
+    if suggest:
+        with stage('suggest', rows=len(frames['Unmatched'])):
+            frames['Possible Matches'] = suggest_matches(frames['IE Tire'], frames['Unmatched'])
+        stats['suggested'] = frames['Possible Matches']['Part'].nunique()
+    if output_file is None:
+        output_file = default_output_file(simple_file)
+    outputs = write_outputs(frames, output_file, xlsx=xlsx, columnar=columnar)
+    return Result(output_file if xlsx else None, stats, frames, outputs)
@@ -1,12 +1,30 @@
+import time
+STARTED = time.perf_counter()
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
-import pandas as pd
-from openpyxl import load_workbook
-from openpyxl.styles import PatternFill, Font
-from datetime import datetime
+import json
 import os
+import queue
+import threading
+import traceback
+import profiling
+
+# How often the window drains the worker's progress queue, in ms
+POLL_MS = 100
+# Set by the build workflow: record how long the window took to appear, then quit
+STARTUP_FILE_ENV = 'RT_RECONCILER_STARTUP_FILE'
+
+def load_pipeline():
+    """Import the pandas/openpyxl pipeline. Slow in the onefile build, so it is kept off the window's startup path."""
+    import cache
+    import reconciler
+    import writer
+    return cache, reconciler, writer
 
 class ReconcilerApp:
+    # Name from reconciler.STRATEGIES, looked up once the pipeline is loaded
+    strategy = 'row-claim'
+
     def __init__(self, root):
         self.root = root
         self.root.title("RT Reconciler")
@@ -15,7 +33,12 @@ class ReconcilerApp:
         self.root.configure(bg='#f0f0f0')
         self.simple_file = tk.StringVar()
         self.rt_file = tk.StringVar()
+        self.reporter = None
+        self.closing = False
         self.create_widgets()
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        # Warm the imports while the user picks files; a reconcile started sooner just waits on the import lock
+        self.root.after_idle(lambda: threading.Thread(target=load_pipeline, daemon=True).start())
 
     def create_widgets(self):
         title = tk.Label(self.root, text="RT vs Simple Reconciler", font=("Arial", 18, "bold"), bg='#f0f0f0')
@@ -36,15 +59,19 @@ class ReconcilerApp:
         tk.Button(f2, text="Browse...", command=self.browse_rt, width=10).pack(side="right", padx=5)
         self.status_var = tk.StringVar(value="Select files and click Reconcile")
         tk.Label(self.root, textvariable=self.status_var, font=("Arial", 10), bg='#f0f0f0').pack(pady=15)
-        self.btn = tk.Button(self.root, text="RECONCILE", font=("Arial", 14, "bold"), width=20, height=2, bg='#4472C4', fg='white', activebackground='#3461b3', activeforeground='white', cursor='hand2', command=self.start_reconcile)
-        self.btn.pack(pady=20)
+        buttons = tk.Frame(self.root, bg='#f0f0f0')
+        buttons.pack(pady=20)
+        self.btn = tk.Button(buttons, text="RECONCILE", font=("Arial", 14, "bold"), width=20, height=2, bg='#4472C4', fg='white', activebackground='#3461b3', activeforeground='white', cursor='hand2', command=self.start_reconcile)
+        self.btn.pack(side="left")
+        self.cancel_btn = tk.Button(buttons, text="Cancel", font=("Arial", 11), width=8, height=2, state='disabled', command=self.cancel_reconcile)
+        self.cancel_btn.pack(side="left", padx=10)
 
     def browse_simple(self):
         f = filedialog.askopenfilename(title="Select Simple Workbook", filetypes=[("Excel", "*.xlsx *.xls")])
         if f: self.simple_file.set(f)
 
     def browse_rt(self):
-        f = filedialog.askopenfilename(title="Select RT Scan Export", filetypes=[("Excel", "*.xlsx *.xls")])
+        f = filedialog.askopenfilename(title="Select RT Scan Export", filetypes=[("Excel or CSV", "*.xlsx *.xls *.csv")])
         if f: self.rt_file.set(f)
 
     def start_reconcile(self):
@@ -52,29 +79,78 @@ class ReconcilerApp:
             messagebox.showerror("Error", "Please select both files")
             return
         self.btn.config(state='disabled')
+        self.cancel_btn.config(state='normal')
         self.status_var.set("Processing...")
-        self.root.update()
+        self.events = queue.Queue()
+        self.reporter = profiling.ProgressReporter(self.events)
+        threading.Thread(target=self.run_worker, args=(self.simple_file.get(), self.rt_file.get(), self.reporter), daemon=True).start()
+        self.root.after(POLL_MS, self.poll_events)
+
+    def run_worker(self, simple_file, rt_file, reporter):
+        """Runs on the worker thread; only talks to the window through the event queue."""
         try:
-            output, stats = self.reconcile(self.simple_file.get(), self.rt_file.get())
-            self.on_complete(output, stats)
+            with profiling.activate(reporter):
+                output, stats = self.reconcile(simple_file, rt_file)
+            reporter.events.put(('complete', output, stats))
+        except profiling.Cancelled:
+            reporter.events.put(('cancelled',))
         except Exception as e:
-            import traceback
-            self.on_error(str(e) + "\n\n" + traceback.format_exc())
+            reporter.events.put(('error', str(e) + "\n\n" + traceback.format_exc()))
+
+    def poll_events(self):
+        while True:
+            try:
+                event = self.events.get_nowait()
+            except queue.Empty:
+                break
+            kind = event[0]
+            if kind == 'stage':
+                self.status_var.set("{}...".format(event[1].capitalize()))
+            elif kind == 'progress':
+                self.status_var.set("{}: {:,} rows ({:,.0f} rows/s)".format(event[1].capitalize(), event[2], event[3]))
+            elif kind in ('complete', 'cancelled', 'error'):
+                self.reporter = None
+                self.cancel_btn.config(state='disabled')
+                if self.closing:
+                    self.root.destroy()
+                elif kind == 'complete':
+                    self.on_complete(event[1], event[2])
+                elif kind == 'cancelled':
+                    self.on_cancelled()
+                else:
+                    self.on_error(event[1])
+                return
+        self.root.after(POLL_MS, self.poll_events)
+
+    def cancel_reconcile(self):
+        if self.reporter is not None:
+            self.reporter.cancel()
+            self.cancel_btn.config(state='disabled')
+            self.status_var.set("Cancelling...")
+
+    def on_close(self):
+        # Let the worker stop at its next checkpoint so no half-written output is left behind
+        if self.reporter is None:
+            self.root.destroy()
+            return
+        self.closing = True
+        self.cancel_reconcile()
 
     def on_complete(self, output_file, stats):
         self.btn.config(state='normal')
         self.status_var.set("Complete!")
+        _, reconciler, _ = load_pipeline()
         msg = "Reconciliation complete!\n\n"
-        msg += "Total rows in: {}\n".format(stats['total_in'])
-        msg += "IE Tire (not yet scanned): {}\n".format(stats['remaining'])
-        msg += "Ready to Receive: {}\n".format(stats['ready'])
-        msg += "Previously Received: {}\n".format(stats['prev_received'])
-        msg += "Unmatched Scans: {}\n".format(stats['unmatched'])
-        msg += "Total rows out: {}\n\n".format(stats['total_out'])
-        msg += "Output: {}\n\nOpen now?".format(os.path.basename(output_file))
+        for key, label in reconciler.get_strategy(self.strategy).stat_labels:
+            msg += "{}: {}\n".format(label, stats[key])
+        msg += "\nOutput: {}\n\nOpen now?".format(os.path.basename(output_file))
         if messagebox.askyesno("Success", msg):
             os.startfile(output_file)
 
+    def on_cancelled(self):
+        self.btn.config(state='normal')
+        self.status_var.set("Cancelled - no output written")
+
     def on_error(self, msg):
         self.btn.config(state='normal')
         self.status_var.set("Error")
@@ -82,152 +158,31 @@ class ReconcilerApp:
 
     @staticmethod
     def clean_part(val):
-        if pd.isna(val):
-            return ''
-        return str(val).strip().rstrip('[').upper()
+        _, reconciler, _ = load_pipeline()
+        return reconciler.clean_part(val)
 
     def reconcile(self, simple_file, rt_file):
-        xl = pd.ExcelFile(simple_file)
-        ie_df = pd.read_excel(xl, sheet_name='IE Tire')
-        # Combine all detail tabs into one pool so no rows get lost
-        all_detail = ie_df.copy()
-        for name in ['Ready_to_Receive', 'Ready to Receive']:
-            if name in xl.sheet_names:
-                all_detail = pd.concat([all_detail, pd.read_excel(xl, sheet_name=name)], ignore_index=True)
-                break
-        for name in ['Previously Received', 'Previously_Received']:
-            if name in xl.sheet_names:
-                all_detail = pd.concat([all_detail, pd.read_excel(xl, sheet_name=name)], ignore_index=True)
-                break
-        # Load existing unmatched scans to carry forward
-        existing_unmatched = pd.DataFrame()
-        for name in ['Unmatched_Scans', 'Unmatched']:
-            if name in xl.sheet_names:
-                existing_unmatched = pd.read_excel(xl, sheet_name=name)
-                break
-        total_in = len(all_detail)
-        all_detail['_clean_iet'] = all_detail['IET #'].apply(self.clean_part)
-        if 'part_number' in all_detail.columns:
-            all_detail['_clean_pn'] = all_detail['part_number'].apply(self.clean_part)
-        else:
-            all_detail['_clean_pn'] = ''
-        # Load and aggregate RT scans
-        rt_raw = pd.read_excel(rt_file, sheet_name=0)
-        part_col = None
-        qty_col = None
-        for c in rt_raw.columns:
-            cl = str(c).lower().strip()
-            if cl == 'part':
-                part_col = c
-            elif 'qty' in cl or 'quantity' in cl:
-                qty_col = c
-        if part_col is None:
-            raise ValueError("Cannot find Part column in RT file. Columns: {}".format(rt_raw.columns.tolist()))
-        if qty_col is None:
-            qty_col = '_qty'
-            rt_raw[qty_col] = 1
-        else:
-            rt_raw[qty_col] = pd.to_numeric(rt_raw[qty_col], errors='coerce').fillna(1).astype(int)
-        rt_raw['_clean_part'] = rt_raw[part_col].apply(self.clean_part)
-        rt_agg = rt_raw.groupby('_clean_part')[qty_col].sum().reset_index()
-        rt_agg.columns = ['Part', 'RT_Qty']
-        rt_agg = rt_agg[rt_agg['Part'] != '']
-        # Match RT scans against detail rows
-        all_detail['_matched'] = False
-        all_detail['_match_status'] = ''
-        new_unmatched = []
-        for _, rt_row in rt_agg.iterrows():
-            rt_part = rt_row['Part']
-            rt_qty = int(rt_row['RT_Qty'])
-            mask_iet = (all_detail['_clean_iet'] == rt_part) & (~all_detail['_matched'])
-            mask_pn = (all_detail['_clean_pn'] == rt_part) & (~all_detail['_matched'])
-            matching_idx = all_detail[mask_iet].index.tolist()
-            if not matching_idx:
-                matching_idx = all_detail[mask_pn].index.tolist()
-            if not matching_idx:
-                new_unmatched.append({'Part': rt_part + '[', 'Qty': rt_qty})
-                continue
-            simple_qty = all_detail.loc[matching_idx, 'return_qty'].sum()
-            simple_qty = int(simple_qty) if pd.notna(simple_qty) else len(matching_idx)
-            if rt_qty >= simple_qty:
-                all_detail.loc[matching_idx, '_matched'] = True
-                all_detail.loc[matching_idx, '_match_status'] = 'full'
-                excess = rt_qty - simple_qty
-                if excess > 0:
-                    new_unmatched.append({'Part': rt_part + '[', 'Qty': excess})
-            else:
-                claimed = 0
-                for idx in matching_idx:
-                    if claimed >= rt_qty:
-                        break
-                    row_qty = all_detail.at[idx, 'return_qty']
-                    row_qty = int(row_qty) if pd.notna(row_qty) else 1
-                    all_detail.at[idx, '_matched'] = True
-                    all_detail.at[idx, '_match_status'] = 'partial'
-                    claimed += row_qty
-        # Split into tabs
-        prev_received_df = all_detail[all_detail['_match_status'] == 'full'].copy()
-        ready_df = all_detail[all_detail['_match_status'] == 'partial'].copy()
-        remaining_df = all_detail[~all_detail['_matched']].copy()
-        drop_cols = ['_clean_iet', '_clean_pn', '_matched', '_match_status']
-        prev_received_df = prev_received_df.drop(columns=drop_cols, errors='ignore')
-        ready_df = ready_df.drop(columns=drop_cols, errors='ignore')
-        remaining_df = remaining_df.drop(columns=drop_cols, errors='ignore')
-        # Build unmatched tab - carry forward existing + add new
-        new_unmatched_df = pd.DataFrame(new_unmatched)
-        if len(existing_unmatched) > 0 and len(new_unmatched_df) > 0:
-            for col in existing_unmatched.columns:
-                if col not in new_unmatched_df.columns:
-                    new_unmatched_df[col] = ''
-            new_unmatched_df = new_unmatched_df[existing_unmatched.columns]
-            unmatched_df = pd.concat([existing_unmatched, new_unmatched_df], ignore_index=True)
-            unmatched_df = unmatched_df.drop_duplicates(subset=['Part'], keep='first')
-        elif len(existing_unmatched) > 0:
-            unmatched_df = existing_unmatched
-        elif len(new_unmatched_df) > 0:
-            unmatched_df = new_unmatched_df
-        else:
-            unmatched_df = pd.DataFrame(columns=['Part', 'Qty'])
-        total_out = len(remaining_df) + len(ready_df) + len(prev_received_df)
-        stats = {'total_in': total_in, 'remaining': len(remaining_df), 'ready': len(ready_df), 'prev_received': len(prev_received_df), 'unmatched': len(unmatched_df), 'total_out': total_out}
-        output_file = os.path.join(os.path.dirname(simple_file), "Reconciled_{}.xlsx".format(datetime.now().strftime('%Y%m%d_%H%M%S')))
-        with pd.ExcelWriter(output_file, engine='openpyxl') as writer:
-            remaining_df.to_excel(writer, sheet_name='IE Tire', index=False)
-            ready_df.to_excel(writer, sheet_name='Ready to Receive', index=False)
-            unmatched_df.to_excel(writer, sheet_name='Unmatched', index=False)
-            prev_received_df.to_excel(writer, sheet_name='Previously Received', index=False)
-        self.format_workbook(output_file)
-        return output_file, stats
+        cache, reconciler, _ = load_pipeline()
+        result = reconciler.reconcile(simple_file, rt_file, cache=cache.SheetCache(), strategy=self.strategy)
+        return result.output_file, result.stats
 
     def format_workbook(self, file_path):
-        wb = load_workbook(file_path)
-        header_fill = PatternFill('solid', fgColor='4472C4')
-        header_font = Font(color='FFFFFF', bold=True)
-        red = PatternFill('solid', fgColor='FFC7CE')
-        yellow = PatternFill('solid', fgColor='FFEB9C')
-        green = PatternFill('solid', fgColor='C6EFCE')
-        for ws in wb.worksheets:
-            for cell in ws[1]:
-                cell.fill = header_fill
-                cell.font = header_font
-            for col in ws.columns:
-                max_len = max(len(str(cell.value or '')) for cell in col)
-                ws.column_dimensions[col[0].column_letter].width = min(max_len + 2, 30)
-            if ws.title == 'Ready to Receive':
-                for row in ws.iter_rows(min_row=2):
-                    for cell in row:
-                        cell.fill = yellow
-            elif ws.title == 'Unmatched':
-                for row in ws.iter_rows(min_row=2):
-                    for cell in row:
-                        cell.fill = red
-            elif ws.title == 'Previously Received':
-                for row in ws.iter_rows(min_row=2):
-                    for cell in row:
-                        cell.fill = green
-        wb.save(file_path)
+        _, _, writer = load_pipeline()
+        writer.format_workbook(file_path)
 
-if __name__ == '__main__':
+def record_startup(root, path):
+    root.update()
+    with open(path, 'w') as f:
+        json.dump({'window_seconds': round(time.perf_counter() - STARTED, 3)}, f)
+    root.destroy()
+
+def main(app_class=ReconcilerApp):
     root = tk.Tk()
-    ReconcilerApp(root)
+    app_class(root)
+    startup_file = os.environ.get(STARTUP_FILE_ENV)
+    if startup_file:
+        root.after_idle(record_startup, root, startup_file)
     root.mainloop()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,225 @@
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+from datetime import datetime
+import pandas as pd
+import ingest
+import reconciler
+from matching import match_scans
+from normalize import canonical, clean_parts
+from profiling import stage
+from writer import write_outputs
+
+STATE_FILE = 'rt_reconciler_state.sqlite'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS scans (scan_key TEXT PRIMARY KEY, part TEXT NOT NULL, qty INTEGER NOT NULL, export TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS scans_part ON scans (part);
+CREATE TABLE IF NOT EXISTS exports (digest TEXT PRIMARY KEY, file TEXT, applied_at TEXT, new_scans INTEGER);
+CREATE TABLE IF NOT EXISTS open_unmatched (part TEXT PRIMARY KEY, qty INTEGER NOT NULL);
+-- The detail rows' workbook columns, pickled with their index as _row_id
+CREATE TABLE IF NOT EXISTS detail_payload (id INTEGER PRIMARY KEY CHECK (id = 0), frame BLOB NOT NULL);
+"""
+
+
+def default_state_file(simple_file):
+    return os.path.join(os.path.dirname(simple_file), STATE_FILE)
+
+
+def scan_columns(columns, part_pos, qty_pos):
+    """Positions of the RT columns that identify a scan: Start DT, Part and quantity."""
+    start = [i for i, c in enumerate(columns) if str(c).lower().strip().startswith('start')]
+    return sorted(set(start + [p for p in (part_pos, qty_pos) if p is not None]))
+
+
+def read_scans(rt_file, engine=None):
+    """Read individual RT scans as (scan_key, part, qty) rows.
+
+    A scan is identified by its Start DT, Part and quantity cells plus its
+    occurrence number among scans with the same cells, so the same scan
+    appearing in a later, overlapping export is recognised and skipped.
+    Cells are keyed through canonical(), so the key does not depend on
+    the column dtypes of the export, and columns that come and go between
+    exports do not change it.
+    """
+    rt_raw = ingest.read_sheet(rt_file, 0, engine)
+    part_pos, qty_pos = ingest.find_rt_columns(rt_raw.columns)
+    if part_pos is None:
+        raise ValueError("Cannot find Part column in RT file. Columns: {}".format(rt_raw.columns.tolist()))
+    if qty_pos is None:
+        qty = pd.Series(1, index=rt_raw.index)
+    else:
+        qty = pd.to_numeric(rt_raw.iloc[:, qty_pos], errors='coerce').fillna(1).astype(int)
+    cells = rt_raw.iloc[:, scan_columns(rt_raw.columns, part_pos, qty_pos)]
+    row_text = pd.Series(['\x1f'.join(map(canonical, row)) for row in cells.itertuples(index=False, name=None)], index=rt_raw.index, dtype=object)
+    occurrence = row_text.groupby(row_text).cumcount().astype(str)
+    keys = (row_text + '\x1e' + occurrence).map(lambda t: hashlib.sha1(t.encode('utf-8')).hexdigest())
+    scans = pd.DataFrame({'scan_key': keys, 'part': clean_parts(rt_raw.iloc[:, part_pos]), 'qty': qty})
+    return scans[scans['part'] != '']
+
+
+class StateStore:
+    """SQLite record of the detail pool, claimed rows and applied RT scans.
+
+    The store is seeded once from a Simple workbook. Each RT export then only
+    adds its new scans: the parts they touch are re-matched against rows that
+    are still open or were claimed by those same parts, and every other row
+    keeps its status. Workbooks are rendered from the store.
+
+    Applying one export to a fresh store gives the same tabs as a full
+    reconcile. Across several exports, a row already claimed through the
+    part_number fallback stays with that part even if a later export scans
+    its IET #, so results can differ from one full run over all scans.
+    """
+
+    def __init__(self, state_file):
+        self.state_file = state_file
+        self.con = sqlite3.connect(state_file)
+        self.con.executescript(SCHEMA)
+
+    def close(self):
+        self.con.close()
+
+    def get_meta(self, key, default=None):
+        row = self.con.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set_meta(self, key, value):
+        self.con.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, json.dumps(value)))
+
+    @property
+    def seeded(self):
+        return self.get_meta('columns') is not None
+
+    def seed(self, simple_file, engine=None):
+        """Load the Simple workbook's detail rows (all open) and carried Unmatched tab.
+
+        Only the match keys, return_qty and match status go into the
+        detail table. The workbook columns are stored once as a pickled
+        frame, so mixed columns (IET # 12345 next to 'B-1', dates next to
+        notes) come back with the cell types they were read with.
+        """
+        all_detail, existing_unmatched = reconciler.load_simple(simple_file, engine=engine)
+        all_detail = all_detail.reset_index(drop=True)
+        columns = [c for c in all_detail.columns if c not in reconciler.HELPER_COLS]
+        detail = pd.DataFrame({
+            '_clean_iet': all_detail['_clean_iet'].astype(object),
+            '_clean_pn': all_detail['_clean_pn'].astype(object),
+            'return_qty': pd.to_numeric(all_detail['return_qty'], errors='coerce'),
+            '_status': '',
+            '_claimed_by': '',
+        }, index=all_detail.index)
+        payload = pickle.dumps(all_detail[columns], protocol=pickle.HIGHEST_PROTOCOL)
+        with self.con, stage('seed state', rows=len(detail)):
+            detail.to_sql('detail', self.con, index=True, index_label='_row_id', if_exists='replace')
+            self.con.execute("CREATE INDEX detail_iet ON detail (_clean_iet)")
+            self.con.execute("CREATE INDEX detail_pn ON detail (_clean_pn)")
+            self.con.execute("CREATE INDEX detail_claimed ON detail (_claimed_by)")
+            self.con.execute("CREATE INDEX detail_status ON detail (_status)")
+            self.con.execute("INSERT OR REPLACE INTO detail_payload (id, frame) VALUES (0, ?)", (payload,))
+            if len(existing_unmatched.columns):
+                existing_unmatched.to_sql('carried_unmatched', self.con, index=False, if_exists='replace')
+            self.set_meta('columns', [str(c) for c in columns])
+            self.set_meta('source', os.path.abspath(simple_file))
+            self.set_meta('source_digest', ingest.file_digest(simple_file))
+
+    def check_source(self, simple_file):
+        """Raise ValueError unless simple_file is the workbook the store was seeded from, unchanged.
+
+        The store never re-reads the Simple workbook, so any other file
+        (a later Reconciled_*.xlsx, another branch's workbook, an edited
+        copy) would otherwise be silently ignored.
+        """
+        if self.con.execute("SELECT 1 FROM detail_payload").fetchone() is None:
+            raise ValueError("State store {} was written by an older version that did not keep the detail rows' cell types; use a different --state file to start over".format(self.state_file))
+        source = self.get_meta('source')
+        if os.path.normcase(os.path.abspath(simple_file)) != os.path.normcase(source):
+            raise ValueError("State store {} was seeded from {}, not {}; pass that workbook, or use a different --state file to start over from this one".format(
+                self.state_file, source, os.path.abspath(simple_file)))
+        digest = self.get_meta('source_digest')
+        if digest is not None and ingest.file_digest(simple_file) != digest:
+            raise ValueError("{} has changed since state store {} was seeded from it; use a different --state file to start over".format(simple_file, self.state_file))
+
+    def apply_export(self, rt_file, engine=None):
+        """Apply the scans of an RT export that the store has not seen yet.
+
+        Returns the number of new scans applied.
+        """
+        digest = ingest.file_digest(rt_file)
+        if self.con.execute("SELECT 1 FROM exports WHERE digest = ?", (digest,)).fetchone():
+            return 0
+        with stage('read scans') as st:
+            scans = read_scans(rt_file, engine)
+            scans = scans.drop_duplicates('scan_key')
+            st['rows'] = len(scans)
+        known = pd.read_sql("SELECT scan_key FROM scans WHERE scan_key IN (SELECT value FROM json_each(?))", self.con, params=(json.dumps(scans['scan_key'].tolist()),))
+        new = scans[~scans['scan_key'].isin(known['scan_key'])]
+        with self.con:
+            if len(new):
+                with stage('rematch', rows=len(new)):
+                    self.rematch(new)
+                self.con.executemany("INSERT INTO scans (scan_key, part, qty, export) VALUES (?, ?, ?, ?)",
+                                     zip(new['scan_key'], new['part'], new['qty'].astype(int).tolist(), [digest] * len(new)))
+            self.con.execute("INSERT INTO exports (digest, file, applied_at, new_scans) VALUES (?, ?, ?, ?)",
+                             (digest, os.path.abspath(rt_file), datetime.now().isoformat(timespec='seconds'), len(new)))
+        return len(new)
+
+    def rematch(self, new):
+        """Re-match the parts touched by new scans using their cumulative quantities."""
+        touched = sorted(new['part'].unique())
+        parts_json = json.dumps(touched)
+        applied = dict(self.con.execute("SELECT part, SUM(qty) FROM scans WHERE part IN (SELECT value FROM json_each(?)) GROUP BY part", (parts_json,)).fetchall())
+        delta = new.groupby('part')['qty'].sum()
+        rt_agg = pd.DataFrame({'Part': touched, 'RT_Qty': [applied.get(p, 0) + int(delta[p]) for p in touched]})
+        # Only rows that are still open, or were claimed by a touched part, take part in the match
+        pool = pd.read_sql(
+            "SELECT _row_id, _clean_iet, _clean_pn, return_qty FROM detail "
+            "WHERE _status = '' OR _claimed_by IN (SELECT value FROM json_each(?)) ORDER BY _row_id",
+            self.con, params=(parts_json,))
+        pool['return_qty'] = pd.to_numeric(pool['return_qty'], errors='coerce')
+        matched, status, claimed_by, new_unmatched = match_scans(pool, rt_agg)
+        self.con.executemany("UPDATE detail SET _status = ?, _claimed_by = ? WHERE _row_id = ?",
+                             zip(status, claimed_by, pool['_row_id'].tolist()))
+        self.con.execute("DELETE FROM open_unmatched WHERE part IN (SELECT value FROM json_each(?))", (parts_json,))
+        self.con.executemany("INSERT INTO open_unmatched (part, qty) VALUES (?, ?)",
+                             [(r['Part'][:-1], int(r['Qty'])) for r in new_unmatched])
+
+    def detail_frame(self):
+        all_detail = pickle.loads(self.con.execute("SELECT frame FROM detail_payload WHERE id = 0").fetchone()[0])
+        status = pd.read_sql("SELECT _row_id, _status FROM detail", self.con, index_col='_row_id')['_status'].reindex(all_detail.index)
+        all_detail['_matched'] = (status != '').to_numpy()
+        all_detail['_match_status'] = status.to_numpy()
+        return all_detail
+
+    def render(self, output_file, xlsx=True, columnar=()):
+        """Write the current state as a reconciled workbook and/or columnar files. Returns reconciler.Result."""
+        tables = {r[0] for r in self.con.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        existing_unmatched = pd.read_sql("SELECT * FROM carried_unmatched", self.con) if 'carried_unmatched' in tables else pd.DataFrame()
+        new_unmatched = [{'Part': part + '[', 'Qty': qty} for part, qty in self.con.execute("SELECT part, qty FROM open_unmatched ORDER BY part")]
+        with stage('load state') as st:
+            all_detail = self.detail_frame()
+            st['rows'] = len(all_detail)
+        frames, stats = reconciler.split_tabs(all_detail, existing_unmatched, new_unmatched)
+        outputs = write_outputs(frames, output_file, xlsx=xlsx, columnar=columnar)
+        return reconciler.Result(output_file if xlsx else None, stats, frames, outputs)
+
+
+def reconcile_incremental(simple_file, rt_file, state_file=None, output_file=None, engine=None, xlsx=True, columnar=()):
+    """Apply an RT export to the state store (seeding it from simple_file if new) and render the workbook."""
+    if state_file is None:
+        state_file = default_state_file(simple_file)
+    store = StateStore(state_file)
+    try:
+        if not store.seeded:
+            store.seed(simple_file, engine=engine)
+        else:
+            store.check_source(simple_file)
+        store.apply_export(rt_file, engine=engine)
+        if output_file is None:
+            output_file = reconciler.default_output_file(simple_file)
+        return store.render(output_file, xlsx=xlsx, columnar=columnar)
+    finally:
+        store.close()
@@ -0,0 +1,158 @@
+import argparse
+import os
+import re
+import sys
+import time
+from datetime import datetime
+import audit
+import ingest
+import reconciler
+import writer
+
+RT_EXTENSIONS = ingest.RT_EXTENSIONS
+# A file counts as fully written once its size and mtime have not changed for this long
+SETTLE_SECONDS = 5.0
+POLL_SECONDS = 2.0
+
+
+def output_file_for(output_dir, rt_file):
+    # Several exports can land in the same second, so tag the output with the export name
+    stem = re.sub(r'[^\w.-]+', '_', os.path.splitext(os.path.basename(rt_file))[0])
+    return os.path.join(output_dir, "Reconciled_{}_{}.xlsx".format(datetime.now().strftime('%Y%m%d_%H%M%S'), stem))
+
+
+def is_export(name):
+    # Skips our own outputs, Excel lock files and hidden files
+    return name.lower().endswith(RT_EXTENSIONS) and not name.startswith(('Reconciled_', '~$', '.'))
+
+
+class Watcher:
+    """Reconcile each RT export that lands in a folder against the latest carried-forward data.
+
+    The Simple workbook is parsed once. After every export the output tabs
+    become the next run's input in memory (reconciler.carry_forward), so a
+    new export only costs reading it, matching and writing the workbook.
+    A file is picked up once its size and mtime have held still for
+    `settle` seconds; a file that is rewritten later is picked up again.
+    """
+
+    def __init__(self, folder, simple_file, output_dir=None, settle=SETTLE_SECONDS, engine=None, xlsx=True, columnar=(), existing=False, audit_log=None, log=print):
+        self.folder = folder
+        self.output_dir = output_dir or os.path.dirname(os.path.abspath(simple_file))
+        self.settle = settle
+        self.engine = engine
+        self.xlsx = xlsx
+        self.columnar = columnar
+        self.log = log
+        self.audit_log = audit_log
+        self.simple_file = simple_file
+        self.all_detail, self.existing_unmatched = reconciler.load_simple(simple_file, engine=engine)
+        # path -> (size, mtime, first time that signature was seen)
+        self.pending = {}
+        # path -> (size, mtime) last reconciled
+        self.done = {}
+        if not existing:
+            for path, sig in self.scan().items():
+                self.done[path] = sig
+
+    def scan(self):
+        """Current (size, mtime) of every candidate export in the folder."""
+        found = {}
+        simple = os.path.abspath(self.simple_file)
+        with os.scandir(self.folder) as entries:
+            for entry in entries:
+                if not entry.is_file() or not is_export(entry.name) or os.path.abspath(entry.path) == simple:
+                    continue
+                st = entry.stat()
+                found[entry.path] = (st.st_size, st.st_mtime)
+        return found
+
+    def ready(self, now=None):
+        """Exports whose size and mtime have settled and that have not been reconciled as they are, oldest first."""
+        now = time.monotonic() if now is None else now
+        found = self.scan()
+        for path in list(self.pending):
+            if path not in found:
+                del self.pending[path]
+        out = []
+        for path, sig in found.items():
+            if self.done.get(path) == sig or sig[0] == 0:
+                continue
+            seen = self.pending.get(path)
+            if seen is None or seen[:2] != sig:
+                self.pending[path] = sig + (now,)
+            elif now - seen[2] >= self.settle:
+                out.append(path)
+        return sorted(out, key=lambda p: found[p][1])
+
+    def reconcile(self, rt_file):
+        """Apply one export to the warm detail pool and write its output. Returns the reconciler.Result."""
+        rt_agg = reconciler.load_rt(rt_file, engine=self.engine)
+        frames, stats = reconciler.reconcile_frames(self.all_detail, self.existing_unmatched, rt_agg, audit=self.audit_log, rt_file=rt_file)
+        output_file = output_file_for(self.output_dir, rt_file)
+        outputs = writer.write_outputs(frames, output_file, xlsx=self.xlsx, columnar=self.columnar)
+        # Only move on once the output is safely written
+        self.all_detail, self.existing_unmatched = reconciler.carry_forward(frames)
+        return reconciler.Result(output_file if self.xlsx else None, stats, frames, outputs)
+
+    def poll(self, now=None):
+        """Reconcile every settled export once. Returns the number that failed."""
+        failed = 0
+        for path in self.ready(now):
+            sig = self.pending.pop(path)[:2]
+            self.done[path] = sig
+            name = os.path.basename(path)
+            started = time.perf_counter()
+            try:
+                result = self.reconcile(path)
+            except Exception as e:
+                failed += 1
+                self.log("{}: FAILED {}: {}".format(name, type(e).__name__, e))
+                continue
+            self.log("{}: {} -> {} ({:.1f}s)".format(name, ', '.join('{}={}'.format(k, result.stats[k]) for k, _ in reconciler.RowClaim.stat_labels),
+                                                    ';'.join(result.outputs), time.perf_counter() - started))
+        return failed
+
+    def run(self, interval=POLL_SECONDS):
+        while True:
+            self.poll()
+            time.sleep(interval)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='rt-reconciler-watch', description="Reconcile RT exports as they land in a folder, carrying the tabs forward from one export to the next.")
+    parser.add_argument('folder', help="Folder the scanners drop RT exports (.xlsx, .xls or .csv) into")
+    parser.add_argument('simple_file', help="Simple workbook (or the latest Reconciled_*.xlsx) to start from")
+    parser.add_argument('-o', '--output-dir', help="Where to write Reconciled_<timestamp>_<export>.xlsx (default: the Simple workbook's folder)")
+    parser.add_argument('--settle', type=float, default=SETTLE_SECONDS, help="Seconds a file's size must hold still before it is read (default: %(default)s)")
+    parser.add_argument('--interval', type=float, default=POLL_SECONDS, help="Seconds between folder scans (default: %(default)s)")
+    parser.add_argument('--existing', action='store_true', help="Also reconcile exports already in the folder at startup, oldest first")
+    parser.add_argument('--engine', choices=ingest.ENGINES, default='auto', help="Excel reader (default: calamine when installed, else openpyxl)")
+    parser.add_argument('--columnar', action='append', choices=writer.COLUMNAR_FORMATS, default=[], metavar='FORMAT', help="Also write each run's tabs as {}; repeatable".format('/'.join(writer.COLUMNAR_FORMATS)))
+    parser.add_argument('--audit', nargs='?', const='', metavar='AUDIT_DIR', help="Append each export's row claims to an audit log (default: {} next to the Simple workbook)".format(audit.AUDIT_DIR))
+    parser.add_argument('--no-xlsx', action='store_true', help="Skip the styled workbooks (needs --columnar)")
+    args = parser.parse_args(argv)
+    if args.no_xlsx and not args.columnar:
+        parser.error("--no-xlsx needs at least one --columnar format")
+    if not os.path.isdir(args.folder):
+        parser.error("{} is not a folder".format(args.folder))
+    audit_log = None
+    if args.audit is not None:
+        audit_log = audit.AuditLog(args.audit or audit.default_audit_dir(args.simple_file))
+    log = lambda msg: print(msg, flush=True)
+    try:
+        watcher = Watcher(args.folder, args.simple_file, output_dir=args.output_dir, settle=args.settle, engine=args.engine,
+                          xlsx=not args.no_xlsx, columnar=args.columnar, existing=args.existing, audit_log=audit_log, log=log)
+    except (OSError, ValueError, KeyError) as e:
+        print("Error: {}".format(e), file=sys.stderr)
+        return 1
+    log("Watching {} ({} detail rows loaded); Ctrl+C to stop".format(args.folder, len(watcher.all_detail)))
+    try:
+        watcher.run(args.interval)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
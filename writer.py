@@ -0,0 +1,249 @@
+import datetime
+import importlib.util
+import os
+import sqlite3
+from decimal import Decimal
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook, load_workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.compat import safe_string
+from openpyxl.styles import PatternFill, Font
+from openpyxl.utils import get_column_letter
+from profiling import commit, progress, stage
+
+TABS = ['IE Tire', 'Ready to Receive', 'Unmatched', 'Previously Received']
+# Written after TABS only when present in frames
+OPTIONAL_TABS = ['Possible Matches']
+COLUMNAR_FORMATS = ['parquet', 'csv', 'sqlite']
+
+HEADER_FILL = PatternFill('solid', fgColor='4472C4')
+HEADER_FONT = Font(color='FFFFFF', bold=True)
+RED = PatternFill('solid', fgColor='FFC7CE')
+YELLOW = PatternFill('solid', fgColor='FFEB9C')
+GREEN = PatternFill('solid', fgColor='C6EFCE')
+TAB_FILLS = {'Ready to Receive': YELLOW, 'Unmatched': RED, 'Previously Received': GREEN}
+
+# Same number formats pandas.ExcelWriter uses by default
+DATETIME_FORMAT = 'YYYY-MM-DD HH:MM:SS'
+DATE_FORMAT = 'YYYY-MM-DD'
+MAX_WIDTH = 30
+# Rows between progress reports while streaming a sheet
+PROGRESS_ROWS = 2000
+
+
+def excel_value(val):
+    """Convert a DataFrame value the way pandas.ExcelWriter does: (value, number_format)."""
+    if val is None or val is pd.NaT:
+        return None, None
+    if isinstance(val, (bool, np.bool_)):
+        return bool(val), None
+    if isinstance(val, (int, np.integer)):
+        return int(val), None
+    if isinstance(val, (float, np.floating)):
+        if np.isnan(val):
+            return None, None
+        if np.isinf(val):
+            return 'inf' if val > 0 else '-inf', None
+        return float(val), None
+    if isinstance(val, Decimal):
+        return (None, None) if val.is_nan() else (val, None)
+    if isinstance(val, datetime.datetime):
+        return val, DATETIME_FORMAT
+    if isinstance(val, datetime.date):
+        return val, DATE_FORMAT
+    if isinstance(val, datetime.timedelta):
+        return val.total_seconds() / 86400, '0'
+    if isinstance(val, str):
+        return (val or None), None
+    if pd.isna(val):
+        return None, None
+    return str(val), None
+
+
+def column_values(series):
+    """Excel-ready values and number formats for one column."""
+    kind = series.dtype.kind
+    if kind in 'iub':
+        return series.tolist(), None
+    if kind == 'f':
+        values = series.tolist()
+        return [v if v == v and v not in (np.inf, -np.inf) else excel_value(v)[0] for v in values], None
+    values = []
+    formats = []
+    for val in series.tolist():
+        val, fmt = excel_value(val)
+        values.append(val)
+        formats.append(fmt)
+    return values, formats if any(formats) else None
+
+
+def display_len(value):
+    """Length of str(cell.value or '') once the value has been through an xlsx round trip."""
+    if value is None or value is False:
+        return 0
+    if value is True:
+        return 4
+    if isinstance(value, str):
+        return len(value)
+    if isinstance(value, (int, float, Decimal)):
+        # openpyxl stores numbers as '%.16g' and reads back an int unless there is a '.' or exponent
+        text = safe_string(value)
+        number = float(text) if ('.' in text or 'e' in text or 'E' in text) else int(text)
+        return len(str(number)) if number else 0
+    if isinstance(value, datetime.datetime):
+        # Excel keeps millisecond precision and reads dates back as datetimes
+        return 26 if round(value.microsecond / 1000) % 1000 else 19
+    if isinstance(value, datetime.date):
+        return 19
+    return len(str(value))
+
+
+def tab_names(frames):
+    return TABS + [name for name in OPTIONAL_TABS if name in frames]
+
+
+def write_sheet(wb, name, df, done=0):
+    """Stream one tab into a write-only workbook. Returns `done` plus the rows written."""
+    ws = wb.create_sheet(name)
+    fill = TAB_FILLS.get(name)
+    headers = list(df.columns)
+    columns = [column_values(df.iloc[:, i]) for i in range(len(headers))]
+    # Column widths have to be known before any row is streamed out
+    for i, (header, (values, _)) in enumerate(zip(headers, columns), start=1):
+        max_len = max([display_len(excel_value(header)[0])] + [display_len(v) for v in values])
+        ws.column_dimensions[get_column_letter(i)].width = min(max_len + 2, MAX_WIDTH)
+    row = []
+    for header in headers:
+        cell = WriteOnlyCell(ws, value=excel_value(header)[0])
+        cell.fill = HEADER_FILL
+        cell.font = HEADER_FONT
+        row.append(cell)
+    ws.append(row)
+    formats = [fmts for _, fmts in columns]
+    for r, values in enumerate(zip(*[values for values, _ in columns])):
+        if r % PROGRESS_ROWS == 0:
+            progress(done + r)
+        if fill is None and not any(formats):
+            ws.append(values)
+            continue
+        row = []
+        for c, value in enumerate(values):
+            cell = WriteOnlyCell(ws, value=value)
+            if formats[c] is not None and formats[c][r] is not None:
+                cell.number_format = formats[c][r]
+            if fill is not None:
+                cell.fill = fill
+            row.append(cell)
+        ws.append(row)
+    return done + len(df)
+
+
+def save_atomic(path, save):
+    """Call save(tmp_path) beside path and rename, so an interrupted run never leaves a half-written file."""
+    tmp = path + '.tmp'
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    try:
+        save(tmp)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    commit()
+    os.replace(tmp, path)
+
+
+def write_workbook(frames, output_file):
+    """Write the output tabs with headers, fills and column widths in one streaming pass."""
+    wb = Workbook(write_only=True)
+    try:
+        done = 0
+        for name in tab_names(frames):
+            done = write_sheet(wb, name, frames[name], done)
+    except BaseException:
+        for ws in wb.worksheets:
+            if not ws.closed:
+                ws.close()
+        raise
+    save_atomic(output_file, wb.save)
+
+
+def table_name(tab):
+    return tab.replace(' ', '_')
+
+
+def columnar_frame(df):
+    """df with text column labels and mixed-type object columns as text, which Parquet and SQLite need."""
+    out = df.set_axis([str(c) for c in df.columns], axis=1)
+    for col in out.columns:
+        if out[col].dtype == object and pd.api.types.infer_dtype(out[col], skipna=True) in ('mixed', 'mixed-integer'):
+            out[col] = out[col].map(str, na_action='ignore')
+    return out
+
+
+def write_columnar(frames, output_file, fmt):
+    """Write the output tabs named after output_file: one Parquet or CSV file per tab, or one SQLite file with a table per tab.
+
+    Returns the paths written.
+    """
+    stem = os.path.splitext(output_file)[0]
+    if fmt == 'sqlite':
+        def save(path):
+            con = sqlite3.connect(path)
+            try:
+                for name in tab_names(frames):
+                    columnar_frame(frames[name]).to_sql(table_name(name), con, index=False)
+                con.commit()
+            finally:
+                con.close()
+        save_atomic(stem + '.sqlite', save)
+        return [stem + '.sqlite']
+    paths = []
+    for name in tab_names(frames):
+        path = '{}_{}.{}'.format(stem, table_name(name), fmt)
+        if fmt == 'parquet':
+            df = columnar_frame(frames[name])
+            save_atomic(path, lambda tmp: df.to_parquet(tmp, index=False))
+        else:
+            save_atomic(path, lambda tmp: frames[name].to_csv(tmp, index=False))
+        paths.append(path)
+    return paths
+
+
+def write_outputs(frames, output_file, xlsx=True, columnar=()):
+    """Write the styled workbook and/or columnar copies of the tabs. Returns the paths written."""
+    for fmt in columnar:
+        if fmt not in COLUMNAR_FORMATS:
+            raise ValueError("Unknown output format {!r}, expected one of {}".format(fmt, COLUMNAR_FORMATS))
+    if 'parquet' in columnar and importlib.util.find_spec('pyarrow') is None and importlib.util.find_spec('fastparquet') is None:
+        raise ValueError("Parquet output needs pyarrow (pip install pyarrow)")
+    rows = sum(len(frames[name]) for name in tab_names(frames))
+    outputs = []
+    if xlsx:
+        with stage('write xlsx', rows=rows):
+            write_workbook(frames, output_file)
+        outputs.append(output_file)
+    for fmt in columnar:
+        with stage('write ' + fmt, rows=rows):
+            outputs.extend(write_columnar(frames, output_file, fmt))
+    return outputs
+
+
+def format_workbook(file_path):
+    """Apply the output styling to an existing workbook in place."""
+    with stage('format workbook'):
+        wb = load_workbook(file_path)
+        for ws in wb.worksheets:
+            for cell in ws[1]:
+                cell.fill = HEADER_FILL
+                cell.font = HEADER_FONT
+            for col in ws.columns:
+                max_len = max(len(str(cell.value or '')) for cell in col)
+                ws.column_dimensions[col[0].column_letter].width = min(max_len + 2, MAX_WIDTH)
+            fill = TAB_FILLS.get(ws.title)
+            if fill is not None:
+                for row in ws.iter_rows(min_row=2):
+                    for cell in row:
+                        cell.fill = fill
+        wb.save(file_path)